@@ -1,9 +1,31 @@
+import logging
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple, Union
 import streamlit as st
+import streamlit_dynamic_filters as stdf
+from streamlit.errors import StreamlitAPIException
 import config
-import geopandas as gpd
+from core import storage_func as storage
+from core import cache_func
+from core import compare_func
+from core import cube_func
+from core import filter_func
+from core import index_func
+from core import prerender_func
+import timing_func as timing
+
+# geopandas is only imported by the pages that show maps, see load_geodata
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+logger = logging.getLogger(__name__)
+
+# the root logger has no handler under streamlit, without one the reports of the
+# app and of the core package (dataset memory, refreshes) would be dropped
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+for _name in ["core", __name__]:
+    logging.getLogger(_name).setLevel(config.log_level)
 
 # class DynamicFilters:
 #     """
@@ -413,6 +435,104 @@ import geopandas as gpd
 #         st.dataframe(self.filter_df(), **kwargs)
 
 
+class IndexedDynamicFilters(stdf.DynamicFilters):
+    """
+    DynamicFilters that resolves the selections with the bitmap index of the
+    shared dataset.
+
+    filter_df takes the selected rows in one step instead of chaining isin
+    masks over copies of the dataframe, and the options of every multiselect
+    come straight from the index without filtering the dataframe at all.
+    """
+
+    def __init__(self, df, filters, index, filters_name="filters"):
+        """
+        Parameters
+        ----------
+            df : DataFrame
+                The dataframe on which filters are applied.
+            filters : list of filters
+                List of columns names in df for which filters are to be created.
+            index : BitmapIndex
+                Bitmap index of df over the filter columns.
+            filters_name: str, optional
+                Name of the filters object in session state.
+        """
+        self.index = index
+        super().__init__(df, filters, filters_name=filters_name)
+
+    def _selected_filters(self, except_filter=None) -> Dict[str, List[str]]:
+        """Selections in session state except for the specified filter"""
+        return {
+            key: values
+            for key, values in st.session_state[self.filters_name].items()
+            if key != except_filter
+        }
+
+    def filter_df(self, except_filter=None):
+        """Filters the dataframe based on session state excluding the specified filter."""
+        filters = self._selected_filters(except_filter)
+        if not any(filters.values()):
+            return self.df
+        return self.df.iloc[selected_rows(self.df.version, filters)]
+
+    def display_filters(self, location=None, num_columns=0, gap="small"):
+        """Renders the multiselect filters, same behaviour as DynamicFilters.display_filters."""
+        if location not in ["sidebar", "columns", None]:
+            raise StreamlitAPIException(
+                "location must be either 'sidebar' or 'columns'"
+            )
+        if location == "columns" and not 0 < num_columns <= 8:
+            raise StreamlitAPIException(
+                "num_columns must be between 1 and 8 when location is 'columns'"
+            )
+
+        filters_changed = False
+        if location == "columns":
+            col_list = st.columns(num_columns, gap=gap)
+
+        for position, filter_name in enumerate(st.session_state[self.filters_name]):
+            options = filter_options(
+                self.df, self.index, filter_name, self._selected_filters(filter_name)
+            )
+
+            # remove selected values that are not in options anymore
+            selection = st.session_state[self.filters_name][filter_name]
+            valid_selections = [v for v in selection if v in options]
+            if valid_selections != selection:
+                st.session_state[self.filters_name][filter_name] = valid_selections
+                filters_changed = True
+
+            if location == "sidebar":
+                container = st.sidebar
+            elif location == "columns":
+                container = col_list[position % num_columns]
+            else:
+                container = st.container()
+            with container:
+                selected = st.multiselect(
+                    f"Select {filter_name}",
+                    sorted(options),
+                    default=st.session_state[self.filters_name][filter_name],
+                    key=self.filters_name + filter_name,
+                )
+
+            if selected != st.session_state[self.filters_name][filter_name]:
+                st.session_state[self.filters_name][filter_name] = selected
+                filters_changed = True
+
+        if filters_changed:
+            st.rerun()
+
+
+def _shared_index_for(df: pd.DataFrame) -> Optional[index_func.BitmapIndex]:
+    """Get the bitmap index of a dataframe if it is the shared dataset of a version"""
+    version = getattr(df, "version", None)
+    if isinstance(df, storage.ReadOnlyDataFrame) and version is not None:
+        return get_shared_index(version)
+    return None
+
+
 # define a filtering function
 def apply_filters_to_df(
     df: pd.DataFrame,
@@ -440,9 +560,6 @@ def apply_filters_to_df(
 
     """
 
-    # define the filtered df
-    df_filtered = df.copy()
-
     # create dictionary of filters
     filter_conditions = {
         "status": status,
@@ -453,11 +570,15 @@ def apply_filters_to_df(
         "generator_type": generator_type,
     }
 
-    for column, values in filter_conditions.items():
-        if values:
-            df_filtered = df_filtered[df_filtered[column].isin(values)]
+    # the shared dataset has a bitmap index, other frames are filtered with a
+    # single combined mask
+    index = _shared_index_for(df)
+    if index is not None:
+        if not any(filter_conditions.values()):
+            return df
+        return df.iloc[selected_rows(df.version, filter_conditions)]
 
-    return df_filtered
+    return filter_func.apply_filters(df, filter_conditions)
 
 
 # define groupby function for graphs
@@ -474,7 +595,7 @@ def groupby_func_to_df(
     Returns:
         pd.DataFrame: Grouped DataFrame
     """
-    return df.groupby(category).agg({"electric_power_inst": "sum"}).reset_index()
+    return filter_func.group_power(df, category)
 
 
 # function for dynamic cascading or dependant filters
@@ -505,11 +626,7 @@ def get_filtered_options(
     Returns:
         List[str]: Sorted list of unique values from the specified column
     """
-    for col, values in filters.items():
-        if values:
-            df = df[df[col].isin(values)]
-
-    return sorted(df[column].unique())
+    return filter_func.filtered_options(df, column, filters, _shared_index_for(df))
 
 
 # function for forcing at least 1 option in a filter
@@ -532,54 +649,423 @@ def ensure_last_selection(
 
 
 # initialize dataframe with original data
-@st.cache_data
-def load_data() -> None:
+def dataset_version() -> Optional[str]:
+    """Get the current dataset version, syncing the first snapshot from the source if needed"""
+    try:
+        return storage.sync_snapshot()
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return None
+
+
+def load_data(version: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Load a version of the dataset from the local snapshots, the current one by default"""
     try:
-        return pd.read_pickle(config.csv_file_path)
+        return storage.load_dataset(version)
     except Exception as e:
-        st.eror(f"Error loading data: {str(e)}")
+        st.error(f"Error loading data: {str(e)}")
         return None
 
 
-@st.cache_data
-def load_geodata() -> None:
+def load_geodata(level: str) -> Optional["gpd.GeoDataFrame"]:
+    """Load the geodataframe with the states of Brazil at a resolution level"""
     try:
-        return gpd.read_file(config.geojson_file_path_state)
+        from core import geo_func as geo
+
+        return geo.read_geometry(level)
     except Exception as e:
         st.error(f"Error loading geodata: {str(e)}")
         return None
 
 
+# memory in bytes held by each shared dataframe
+_shared_memory: Dict[str, int] = {}
+
+
+def _register_shared(name: str, df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """Freeze a dataframe shared by every session and log the memory held"""
+    if df is None:
+        return None
+    df = storage.freeze_frame(df)
+    _shared_memory[name] = storage.memory_usage(df)
+    logger.info(
+        "shared dataset %s: %.1f MB, total shared %.1f MB",
+        name,
+        _shared_memory[name] / 1e6,
+        shared_memory_usage() / 1e6,
+    )
+    return df
+
+
+def shared_memory_usage() -> int:
+    """Get the total memory in bytes held by the shared datasets of this process"""
+    return sum(_shared_memory.values())
+
+
+def render_memory_report() -> None:
+    """Show the memory held by the shared datasets in the sidebar of timed sessions"""
+    if not _shared_memory or not timing.timing_enabled():
+        return
+    with st.sidebar.expander("Shared memory", expanded=False):
+        st.caption(f"Total: {shared_memory_usage() / 1e6:,.1f} MB")
+        st.dataframe(
+            [
+                {"dataset": name, "MB": round(size / 1e6, 2)}
+                for name, size in _shared_memory.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+# one read-only instance per process and dataset version referenced by every
+# session, the previous version is kept until the sessions move to the new one
+# and failed loads (None) are not kept in the cache
+@st.cache_resource(max_entries=2, validate=lambda df: df is not None)
+def get_shared_data(version: str) -> Optional[pd.DataFrame]:
+    """Get the process-wide read-only dataframe with the power plants of a dataset version"""
+    df = load_data(version)
+    if df is not None:
+        df = _register_shared("dfData", df)
+        df.version = version
+        df.lineage = storage.read_changelog(version)["lineage"]
+    return df
+
+
+@st.cache_resource(validate=lambda df: df is not None)
+def get_shared_geodata(level: str) -> Optional["gpd.GeoDataFrame"]:
+    """Get the process-wide read-only geodataframe with the states of Brazil at a resolution level"""
+    return _register_shared(f"dfGeoData_{level}", load_geodata(level))
+
+
+@st.cache_resource(max_entries=16)
+# pre-aggregate the plants of one status, the cells are cached by the lineage
+# token of the status partition, so a refresh only rebuilds the statuses it touched
+def get_cube_partition(_df: pd.DataFrame, token: str, status: Any) -> pd.DataFrame:
+    """
+    Build the cells of the aggregation cube of the plants with a status.
+
+    Args:
+        _df (pd.DataFrame): Shared dataset, not hashed
+        token (str): Partition token of the status, see storage_func.partition_token
+        status (Any): Status of the plants, None for the plants without status
+
+    Returns:
+        pd.DataFrame: Cube cells of the status, see cube_func.build_cube
+    """
+    mask = _df["status"].isna() if status is None else _df["status"] == status
+    return cube_func.build_cube(_df[mask.to_numpy()])
+
+
+@st.cache_resource(max_entries=2)
+def get_shared_cube(version: str) -> pd.DataFrame:
+    """Get the process-wide aggregation cube of a dataset version, joined from its status partitions"""
+    df = get_shared_data(version)
+    statuses = [
+        None if pd.isna(status) else status for status in df["status"].drop_duplicates()
+    ]
+    cube = pd.concat(
+        [
+            get_cube_partition(df, storage.partition_token(df, "status", s), s)
+            for s in statuses
+        ],
+        ignore_index=True,
+    )
+    # cells of older versions keep the categories of their version
+    dtypes = {
+        column: df[column].dtype
+        for column in config.dynamic_filter_column_names
+        if isinstance(df[column].dtype, pd.CategoricalDtype)
+    }
+    cube = cube.astype(dtypes)
+    cube_func.check_cube(cube, df)
+    return _register_shared("cube", cube)
+
+
+# the bitmaps hold row positions, which move with every added or removed row, so
+# the index is built per version, the options read from it are cached by lineage
+@st.cache_resource(max_entries=2)
+def get_shared_index(version: str) -> index_func.BitmapIndex:
+    """Get the process-wide bitmap index of the filter columns of a dataset version"""
+    return index_func.BitmapIndex(
+        get_shared_data(version), config.dynamic_filter_column_names
+    )
+
+
+# process-wide options of the filters by the lineage of the rows they are read from
+_filter_options = cache_func.LRUCache(
+    maxsize=config.selection_cache_size, name="filter_options"
+)
+
+
+def filter_options(
+    df: pd.DataFrame,
+    index: index_func.BitmapIndex,
+    column: str,
+    filters: Dict[str, List[str]],
+) -> List[Any]:
+    """
+    Get the values of a column left by the selections of the other filters.
+
+    The options are cached by the lineage token of the rows selected by the
+    other filters, so they are kept across refreshes that do not touch them.
+
+    Args:
+        df (pd.DataFrame): Shared dataset
+        index (index_func.BitmapIndex): Bitmap index of df
+        column (str): Filter column
+        filters (Dict[str, List[str]]): Selections of the other filters
+
+    Returns:
+        List[Any]: Values of the column, in index order
+    """
+    key = (
+        column,
+        cache_func.canonical_filters(filters),
+        storage.selection_token(df, filters),
+    )
+    return _filter_options.get_or_create(key, lambda: index.options(column, filters))
+
+
+# process-wide rows of the shared dataset selected by version and filter signature
+_selections = cache_func.LRUCache(
+    maxsize=config.selection_cache_size, name="selections"
+)
+
+
+def selected_rows(version: str, filters: Dict[str, List[str]]) -> np.ndarray:
+    """
+    Get the rows of the shared dataset of a version that match a filter selection.
+
+    Selections are cached for every session by their canonical signature, a
+    repeated selection is a dictionary lookup instead of a scan of the index.
+
+    Args:
+        version (str): Dataset version
+        filters (Dict[str, List[str]]): Selected values by column, empty lists select everything
+
+    Returns:
+        np.ndarray: Read-only int32 row positions, shared by every session
+    """
+
+    def select() -> np.ndarray:
+        rows = get_shared_index(version).select(filters).astype(np.int32)
+        rows.flags.writeable = False
+        return rows
+
+    return _selections.get_or_create(
+        (version, cache_func.canonical_filters(filters)), select
+    )
+
+
+# process-wide group-bys of the cube by version, filters and group-by columns
+_rollups = cache_func.LRUCache(maxsize=config.figure_cache_size, name="rollups")
+
+
+def groupby_cube_to_df(
+    category: Union[str, List[str]], filters: Optional[Dict[str, List[str]]] = None
+) -> pd.DataFrame:
+    """
+    Group the filtered power plants by a category and sum the electric power.
+
+    Same result as groupby_func_to_df over the filtered dataframe, rolled up from
+    the aggregation cube of the session dataset version. The result is shared by
+    every session and tagged with the lineage token of the selected rows (see
+    storage_func.selection_token), callers must not modify it.
+
+    Args:
+        category (Union[str, List[str]]): Column(s) to group by
+        filters (Optional[Dict[str, List[str]]]): Selected values by column
+
+    Returns:
+        pd.DataFrame: Grouped DataFrame
+    """
+    version = st.session_state.dfData_version
+    columns = category if isinstance(category, str) else tuple(category)
+    # keyed by the lineage of the selected rows, it stays valid across refreshes
+    # that do not touch them
+    token = storage.selection_token(get_shared_data(version), filters)
+    key = (token, cache_func.canonical_filters(filters), columns)
+
+    def rollup() -> pd.DataFrame:
+        cube = get_shared_cube(version)
+        grouped = storage.freeze_frame(cube_func.rollup(cube, category, filters))
+        return cache_func.tag_frame(grouped, key)
+
+    return _rollups.get_or_create(key, rollup)
+
+
+# comparisons of two dataset versions shared by every session, failed ones are
+# not kept in the cache
+@st.cache_resource(
+    max_entries=config.comparison_cache_size,
+    validate=lambda comparison: comparison is not None,
+)
+def get_vintage_comparison(
+    old_version: str, new_version: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Get the process-wide comparison of two dataset versions by plant key.
+
+    Args:
+        old_version (str): Base dataset version
+        new_version (str): Compared dataset version
+
+    Returns:
+        Optional[Dict[str, Any]]: Read-only comparison, see compare_func.compare_vintages
+    """
+    try:
+        comparison = compare_func.compare_versions(old_version, new_version)
+    except Exception as e:
+        st.error(f"Error comparing versions: {str(e)}")
+        return None
+    for name in ["added", "removed", "transitions", "transitioned"]:
+        comparison[name] = storage.freeze_frame(comparison[name])
+    comparison["net_capacity"] = {
+        column: storage.freeze_frame(net)
+        for column, net in comparison["net_capacity"].items()
+    }
+    return comparison
+
+
+# process-wide net capacity totals by version pair, column and status
+_net_capacities = cache_func.LRUCache(
+    maxsize=config.figure_cache_size, name="net_capacities"
+)
+
+
+def net_capacity_totals(
+    old_version: str, new_version: str, column: str, status: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Get the net change of installed power between two dataset versions by a column.
+
+    The result is shared by every session and tagged with its versions, column
+    and status, callers must not modify it.
+
+    Args:
+        old_version (str): Base dataset version
+        new_version (str): Compared dataset version
+        column (str): Column the power is broken down by, one of config.comparison_column_names
+        status (Optional[str]): Status of the plants, every status if None
+
+    Returns:
+        pd.DataFrame: Old, new and net power by column value, see compare_func.net_capacity_totals
+    """
+    key = ("net_capacity", old_version, new_version, column, status)
+
+    def totals() -> pd.DataFrame:
+        net = get_vintage_comparison(old_version, new_version)["net_capacity"]
+        frame = compare_func.net_capacity_totals(net[column], column, status)
+        return cache_func.tag_frame(storage.freeze_frame(frame), key)
+
+    return _net_capacities.get_or_create(key, totals)
+
+
+@st.cache_resource(max_entries=2)
+def get_manifest(version: str) -> Dict[str, Any]:
+    """Get the process-wide manifest of a dataset version, see storage_func.build_manifest"""
+    return storage.read_manifest(version)
+
+
+def dataset_manifest() -> Dict[str, Any]:
+    """Get the manifest of the session dataset version"""
+    return get_manifest(st.session_state.dfData_version)
+
+
+# views that were not prerendered are not kept, so they are picked up once the
+# prerender step writes them
+@st.cache_resource(max_entries=16, validate=lambda view: view is not None)
+def get_prerendered(page: str, version: str) -> Optional[Dict[str, Any]]:
+    """Get the process-wide prerendered default view of a page, see prerender_func.read_prerendered"""
+    return prerender_func.read_prerendered(page, version)
+
+
+def prerendered_view(page: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the prerendered default view of a page for a session that has not loaded the data yet.
+
+    The view is read for the current dataset version without loading the
+    dataset, it is shown while the session loads it and renders the live page.
+
+    Args:
+        page (str): Page, one of prerender_func.pages
+
+    Returns:
+        Optional[Dict[str, Any]]: Parameters, figures and KPIs of the view, None
+        if the session has its data or the view was not prerendered
+    """
+    if st.session_state.get("dfData_loaded"):
+        return None
+    version = storage.current_version()
+    if version is None:
+        return None
+    view = get_prerendered(page, version)
+    # figures referencing the geometry url need the static files served
+    if view is not None and view["geometry"] == "url":
+        if not st.get_option("server.enableStaticServing"):
+            return None
+    return view
+
+
+def status_totals() -> pd.DataFrame:
+    """Get the electric power and number of plants by status of the session dataset version"""
+    totals = pd.DataFrame.from_dict(dataset_manifest()["status"], orient="index")
+    return totals[cube_func.cube_measure_columns]
+
+
+def _reset_stale_options(old_df: pd.DataFrame, new_df: pd.DataFrame) -> None:
+    """Drop the filter options of the session whose distinct values changed"""
+    old_tokens = dict(storage.values_token(old_df))
+    for column, token in storage.values_token(new_df):
+        if old_tokens.get(column) != token and column in st.session_state:
+            st.session_state[column] = None
+
+
 def initialize_session_state_data() -> None:
-    """Initialize session state orignal dataframe"""
+    """Initialize session state orignal dataframe, switching to a new dataset version when published"""
     # data
     if "dfData_loaded" not in st.session_state:
         st.session_state.dfData_loaded = False
 
-    if not st.session_state.dfData_loaded:
-        df = load_data()
+    version = dataset_version()
+    if version is None:
+        st.error("Failed to load data. Please refresh the page.")
+        timing.stop_run({"error": "no dataset version"})
+
+    if (
+        not st.session_state.dfData_loaded
+        or st.session_state.get("dfData_version") != version
+    ):
+        df = get_shared_data(version)
         if df is not None:
+            if st.session_state.dfData_loaded:
+                _reset_stale_options(st.session_state.dfData, df)
             st.session_state.dfData = df
+            st.session_state.dfData_version = version
             st.session_state.dfData_loaded = True
         else:
             st.error("Failed to load data. Please refresh the page.")
-            st.stop()
+            timing.stop_run({"error": "failed to load data", "version": version})
 
 
 # initialize geodataframe with original data
 def initialize_session_state_geodata() -> None:
-    """Initialize session state geodataframe"""
+    """Initialize session state geodataframes, one for each resolution level used by the maps"""
     if "dfGeoData_loaded" not in st.session_state:
         st.session_state.dfGeoData_loaded = False
 
     if not st.session_state.dfGeoData_loaded:
-        dfgeo = load_geodata()
-        if dfgeo is not None:
+        dfgeo = {
+            level: get_shared_geodata(level)
+            for level in set(config.map_geometry_levels.values())
+        }
+        if all(geodf is not None for geodf in dfgeo.values()):
             st.session_state.dfGeoData = dfgeo
             st.session_state.dfGeoData_loaded = True
         else:
             st.error("Failed to load geodata. Please refresh the page.")
-            st.stop()
+            timing.stop_run({"error": "failed to load geodata"})
 
 
 # Initialize variables in session state obtained from dfData
@@ -606,36 +1092,35 @@ def initialize_session_state_variables() -> None:
     if "graph_column" not in st.session_state:
         st.session_state.graph_column = config.groupby_column_names[0]
 
+    # options of the filters come from the manifest, without scanning the rows
+    distinct_values = dataset_manifest()["distinct_values"]
+
     if "status" not in st.session_state or st.session_state.status is None:
-        st.session_state.status = st.session_state.dfData["status"].unique()
+        st.session_state.status = distinct_values["status"]
 
     if "fuel_origin" not in st.session_state or st.session_state.fuel_origin is None:
-        st.session_state.fuel_origin = st.session_state.dfData["fuel_origin"].unique()
+        st.session_state.fuel_origin = distinct_values["fuel_origin"]
 
     if "fuel_type" not in st.session_state or st.session_state.fuel_type is None:
-        st.session_state.fuel_type = st.session_state.dfData["fuel_type"].unique()
+        st.session_state.fuel_type = distinct_values["fuel_type"]
 
     if (
         "generator_type" not in st.session_state
         or st.session_state.generator_type is None
     ):
-        st.session_state.generator_type = st.session_state.dfData[
-            "generator_type"
-        ].unique()
+        st.session_state.generator_type = distinct_values["generator_type"]
 
     if (
         "fuel_type_name" not in st.session_state
         or st.session_state.fuel_type_name is None
     ):
-        st.session_state.fuel_type_name = st.session_state.dfData[
-            "fuel_type_name"
-        ].unique()
+        st.session_state.fuel_type_name = distinct_values["fuel_type_name"]
 
     if "states" not in st.session_state or st.session_state.states is None:
-        st.session_state.states = st.session_state.dfData["states"].unique()
+        st.session_state.states = distinct_values["states"]
 
     if "map_category" not in st.session_state or st.session_state.map_category is None:
-        st.session_state.map_category = ["fuel_origin", "generator_type"]
+        st.session_state.map_category = config.map_category_column_names
 
 
 # define function for sidebar navigation across pages
@@ -649,5 +1134,7 @@ def render_sidebar() -> None:
         st.page_link("pages/1_electric_matrix.py", label="Electric Matrix")
         st.page_link("pages/2_hist_evol.py", label="Historical Evolution")
         st.page_link("pages/3_geo_distr.py", label="Geographic Distribution")
+        st.page_link("pages/4_vintage_comparison.py", label="Vintage Comparison")
 
     st.sidebar.divider()
+    render_memory_report()
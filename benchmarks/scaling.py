@@ -0,0 +1,266 @@
+"""
+Measure how the data and figure functions scale with the size of the dataset.
+
+For every size a synthetic dataset (see synthetic.py) is published as a snapshot
+in a temporary directory and loaded the way the app loads it, then every
+function is timed. The measures run inside a streamlit script run (with
+AppTest), outside of one st.cache_data and st.cache_resource never hit:
+
+- cold: first call, with empty caches, and its peak traced memory.
+- warm: median of the following calls, served from the caches where the app
+  has them.
+
+Results are printed and optionally written as json (with the git commit) to
+compare them across commits, usage:
+
+    python benchmarks/scaling.py [--rows 10000 100000 1000000] [--repeat 3] [--json results.json]
+"""
+
+# import libraries
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import plotly.graph_objects as go  # noqa: E402
+
+import config  # noqa: E402
+from core.payload_func import payload_size  # noqa: E402
+from core import storage_func as storage  # noqa: E402
+import synthetic  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+FILTERS = {"status": ["Operação"], "states": ["SP", "MG"]}
+
+
+def clear_caches() -> None:
+    """Empty every process-wide cache of the app"""
+    import streamlit as st
+
+    import aux_func as aux
+    from core import cache_func
+    import visualization_func as vz
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    cache_func.figure_cache.clear()
+    aux._selections.clear()
+    aux._rollups.clear()
+    vz._geometry_payloads.clear()
+
+
+def benchmarks(df, geodf) -> Dict[str, Callable[[], Any]]:
+    """Get the functions to measure, called over a dataset and its state geometries"""
+    import aux_func as aux
+    import visualization_func as vz
+
+    # input of groupby_func_to_df, the selection is dropped so the measure of
+    # apply_filters_to_df does not start from a cache hit
+    filtered = aux.apply_filters_to_df(df, **FILTERS)
+    aux._selections.clear()
+    return {
+        "apply_filters_to_df": lambda: aux.apply_filters_to_df(df, **FILTERS),
+        "groupby_func_to_df": lambda: aux.groupby_func_to_df(filtered, "fuel_type"),
+        "get_filtered_options": lambda: aux.get_filtered_options(
+            df, "fuel_type", FILTERS
+        ),
+        "hist_line_plot": lambda: vz.hist_line_plot(df, "fuel_origin", "Plotly"),
+        "choropleth_mapbox_ele_pow": lambda: vz.choropleth_mapbox_ele_pow(
+            df, geodf, "Operação", "cividis"
+        ),
+        "loc_map_plot": lambda: vz.loc_map_plot(
+            df, geodf, "Operação", "fuel_origin", "Plotly"
+        ),
+        "loc_map_plot[points]": lambda: vz.loc_map_plot(
+            df, geodf, "Operação", "fuel_origin", "Plotly", clustering="points"
+        ),
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Time a function cold and warm and trace the peak memory of its first call.
+
+    Args:
+        func (Callable[[], Any]): Function to measure
+        repeat (int): Number of warm calls
+
+    Returns:
+        Dict[str, Any]: Cold and warm time, peak memory and payload size of figures
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    cold = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        warm.append(time.perf_counter() - start)
+
+    return {
+        "cold_s": cold,
+        "warm_s": statistics.median(warm) if warm else None,
+        "peak_mb": peak / 1e6,
+        # size of the figure sent to the browser
+        "payload_kb": (
+            payload_size(result) / 1e3 if isinstance(result, go.Figure) else None
+        ),
+    }
+
+
+def run_size(n_rows: int, seed: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    Measure every function over a synthetic dataset.
+
+    Args:
+        n_rows (int): Number of plants of the dataset
+        seed (int): Seed of the generator
+        repeat (int): Number of warm calls of every function
+
+    Returns:
+        List[Dict[str, Any]]: Measures of every function
+    """
+    import aux_func as aux
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        config.data_dir = data_dir
+        # keep any payload written by the measured functions out of the app's static/
+        config.static_dir = os.path.join(data_dir, "static")
+        df = synthetic.generate_plants(n_rows, seed)
+        version = storage.publish_snapshot(
+            df,
+            storage.initial_changelog(df, storage.new_version(), "synthetic"),
+            data_dir,
+        )
+        del df
+        clear_caches()
+
+        start = time.perf_counter()
+        df = aux.get_shared_data(version)
+        load = time.perf_counter() - start
+        geodf = synthetic.generate_states()
+        geodf.attrs["geometry_token"] = "synthetic"
+
+        results = [
+            {
+                "rows": n_rows,
+                "function": "get_shared_data",
+                "cold_s": load,
+                "memory_mb": storage.memory_usage(df) / 1e6,
+            }
+        ]
+        results.append(
+            {
+                "rows": n_rows,
+                "function": "get_shared_index",
+                **measure(lambda: aux.get_shared_index(version), repeat),
+            }
+        )
+        for name, func in benchmarks(df, geodf).items():
+            results.append({"rows": n_rows, "function": name, **measure(func, repeat)})
+        clear_caches()
+    return results
+
+
+def _measure_script(n_rows: int, seed: int, repeat: int, output: str, path: str):
+    """Script run by AppTest, writes the measures of run_size to a json file"""
+    import json
+    import sys
+
+    sys.path.insert(0, path)
+    import scaling
+
+    with open(output, "w") as file:
+        json.dump(scaling.run_size(n_rows, seed, repeat), file)
+
+
+def run_size_in_app(n_rows: int, seed: int, repeat: int) -> List[Dict[str, Any]]:
+    """Run run_size in a streamlit script run, see run_size"""
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        output = os.path.join(output_dir, "results.json")
+        app = AppTest.from_function(
+            _measure_script,
+            args=(n_rows, seed, repeat, output, os.path.dirname(__file__)),
+            default_timeout=24 * 3600,
+        ).run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        with open(output) as file:
+            return json.load(file)
+
+
+def git_commit() -> str:
+    """Get the commit of the working tree, if it is a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(args: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=SIZES, help="dataset sizes"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generator")
+    parser.add_argument("--repeat", type=int, default=3, help="warm calls per function")
+    parser.add_argument("--json", help="write the results to this json file")
+    options = parser.parse_args(args)
+
+    results = []
+    print(
+        f"{'rows':>9} {'function':28} {'cold':>9} {'warm':>9} {'peak':>9} {'payload':>10}"
+    )
+    for n_rows in options.rows:
+        for result in run_size_in_app(n_rows, options.seed, options.repeat):
+            results.append(result)
+            warm = result.get("warm_s")
+            peak = result.get("peak_mb", result.get("memory_mb"))
+            payload = result.get("payload_kb")
+            print(
+                f"{n_rows:>9} {result['function']:28} {result['cold_s']:8.3f}s "
+                + (f"{warm:8.3f}s " if warm is not None else f"{'':9} ")
+                + f"{peak:7.1f}MB "
+                + (f"{payload:8.1f}kB" if payload is not None else "")
+            )
+
+    if options.json:
+        with open(options.json, "w") as file:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "seed": options.seed,
+                    "results": results,
+                },
+                file,
+                indent=1,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Measure the startup cost of every page of the app.
+
+Each page is measured in a fresh python process, the way a new replica starts:
+
+- import: time to import the page module and everything it imports (without
+  running it), and which heavy optional dependencies got imported.
+- first render: time of the first run of the page with streamlit's AppTest,
+  including the data loading, and of a second (warm) run in the same process.
+
+The dataset snapshot must already be available (see core/storage_func.py), the
+run fails if any page raises an exception or shows an error, usage:
+
+    python benchmarks/startup.py [--repeat 3] [--json results.json]
+"""
+
+# import libraries
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = [
+    "main_page.py",
+    "pages/1_electric_matrix.py",
+    "pages/2_hist_evol.py",
+    "pages/3_geo_distr.py",
+    "pages/4_vintage_comparison.py",
+]
+HEAVY_MODULES = ["geopandas", "shapely", "fiona", "plotly.express", "pyarrow"]
+
+IMPORT_SCRIPT = """
+import json, runpy, sys, time
+start = time.perf_counter()
+import streamlit
+streamlit_done = time.perf_counter()
+runpy.run_path({page!r}, run_name="__startup_benchmark__")
+end = time.perf_counter()
+print(json.dumps({{
+    "streamlit_s": streamlit_done - start,
+    "import_s": end - start,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+RENDER_SCRIPT = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file("main_page.py", default_timeout=600)
+if {page!r} != "main_page.py":
+    app.switch_page({page!r})
+app.run()
+first = time.perf_counter()
+app.run()
+second = time.perf_counter()
+print(json.dumps({{
+    "first_render_s": first - start,
+    "warm_render_s": second - first,
+    "exceptions": [str(e.value) for e in app.exception],
+    "errors": [str(e.value) for e in app.error],
+}}))
+"""
+
+
+def run_child(script: str) -> Dict[str, Any]:
+    """Run a script in a fresh python process and parse the json printed last"""
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_page(page: str, repeat: int) -> Dict[str, Any]:
+    """
+    Measure the import and first render time of a page.
+
+    Args:
+        page (str): Path of the page, relative to the repository
+        repeat (int): Number of fresh processes to average over
+
+    Returns:
+        Dict[str, Any]: Median timings and the heavy modules imported by the page
+    """
+    imports = [
+        run_child(IMPORT_SCRIPT.format(page=page, heavy=HEAVY_MODULES))
+        for _ in range(repeat)
+    ]
+    renders = [run_child(RENDER_SCRIPT.format(page=page)) for _ in range(repeat)]
+    return {
+        "page": page,
+        "import_s": statistics.median(r["import_s"] for r in imports),
+        "streamlit_import_s": statistics.median(r["streamlit_s"] for r in imports),
+        "heavy_modules": imports[0]["heavy_modules"],
+        "first_render_s": statistics.median(r["first_render_s"] for r in renders),
+        "warm_render_s": statistics.median(r["warm_render_s"] for r in renders),
+        # a page that failed (e.g. without a snapshot it only shows an error)
+        # renders fast, its timings are not valid
+        "exceptions": sorted({e for r in renders for e in r["exceptions"]}),
+        "errors": sorted({e for r in renders for e in r["errors"]}),
+    }
+
+
+def main(args: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--repeat", type=int, default=3, help="processes per page")
+    parser.add_argument("--json", help="write the results to this json file")
+    parser.add_argument("pages", nargs="*", default=PAGES, help="pages to measure")
+    options = parser.parse_args(args)
+
+    results = []
+    print(f"{'page':30} {'import':>8} {'1st render':>11} {'warm':>8}  heavy modules")
+    for page in options.pages:
+        result = measure_page(page, options.repeat)
+        results.append(result)
+        print(
+            f"{page:30} {result['import_s']:7.2f}s {result['first_render_s']:10.2f}s "
+            f"{result['warm_render_s']:7.2f}s  {', '.join(result['heavy_modules'])}"
+        )
+        for exception in result["exceptions"]:
+            print(f"  exception: {exception}")
+        for error in result["errors"]:
+            print(f"  error: {error}")
+
+    if options.json:
+        with open(options.json, "w") as file:
+            json.dump(results, file, indent=1)
+
+    failed = [r["page"] for r in results if r["exceptions"] or r["errors"]]
+    if failed:
+        sys.exit(
+            f"invalid timings, pages with exceptions or errors: {', '.join(failed)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Generate synthetic power plant datasets with the schema of the ANEEL dataset.
+
+The generator is seeded, the same number of rows and seed always give the same
+dataset. Cardinalities follow the real data: 27 states weighted by number of
+plants, the fuel origin > fuel type > fuel name hierarchy, the generator type
+of every fuel, a few statuses and entry dates skewed to recent years. Plants are
+scattered around the center of their state and the power is log-normal by
+generator type.
+
+The dataset can also be published as a snapshot to run the app over it, usage:
+
+    python benchmarks/synthetic.py --rows 100000 --data-dir /tmp/synthetic
+    ELECTRIC_MATRIX_DATA_DIR=/tmp/synthetic streamlit run main_page.py
+"""
+
+# import libraries
+import argparse
+import os
+import sys
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from core import storage_func as storage  # noqa: E402
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+# state: (share of plants, center latitude, center longitude, spread in degrees)
+STATES = {
+    "MG": (0.17, -18.5, -44.5, 2.5),
+    "SP": (0.12, -22.3, -48.6, 1.8),
+    "RS": (0.08, -29.7, -53.2, 1.8),
+    "PR": (0.08, -24.6, -51.6, 1.5),
+    "BA": (0.07, -12.6, -41.7, 2.8),
+    "GO": (0.05, -15.9, -49.8, 2.0),
+    "SC": (0.05, -27.3, -50.2, 1.0),
+    "MT": (0.05, -12.7, -56.0, 3.0),
+    "RJ": (0.04, -22.3, -42.7, 0.7),
+    "MS": (0.03, -20.5, -54.6, 2.0),
+    "CE": (0.03, -5.2, -39.5, 1.3),
+    "PE": (0.03, -8.4, -37.9, 1.2),
+    "RN": (0.03, -5.8, -36.5, 0.7),
+    "PA": (0.03, -4.0, -52.5, 3.5),
+    "ES": (0.02, -19.6, -40.7, 0.7),
+    "PI": (0.02, -7.7, -42.7, 2.0),
+    "MA": (0.02, -5.4, -45.4, 2.3),
+    "PB": (0.02, -7.2, -36.7, 0.8),
+    "TO": (0.015, -10.2, -48.3, 2.0),
+    "RO": (0.01, -10.9, -63.0, 1.8),
+    "AL": (0.01, -9.6, -36.6, 0.5),
+    "SE": (0.01, -10.6, -37.4, 0.4),
+    "DF": (0.01, -15.8, -47.9, 0.3),
+    "AM": (0.01, -4.2, -64.8, 4.0),
+    "AC": (0.005, -9.0, -70.5, 1.5),
+    "RR": (0.005, 2.1, -61.4, 1.5),
+    "AP": (0.005, 1.4, -51.8, 1.0),
+}
+# fuel name: (share of plants, fuel origin, fuel type, generator types)
+FUELS = {
+    "Radiação solar": (0.55, "Renovável", "Solar", ["UFV"]),
+    "Cinética do vento": (0.08, "Renovável", "Eólica", ["EOL"]),
+    "Potencial hidráulico": (0.08, "Renovável", "Hídrica", ["UHE", "PCH", "CGH"]),
+    "Bagaço de cana de açúcar": (0.04, "Renovável", "Biomassa", ["UTE"]),
+    "Resíduos florestais": (0.01, "Renovável", "Biomassa", ["UTE"]),
+    "Biogás": (0.02, "Renovável", "Biomassa", ["UTE"]),
+    "Licor negro": (0.005, "Renovável", "Biomassa", ["UTE"]),
+    "Óleo diesel": (0.17, "Fóssil", "Petróleo", ["UTE"]),
+    "Óleo combustível": (0.01, "Fóssil", "Petróleo", ["UTE"]),
+    "Gás natural": (0.02, "Fóssil", "Gás Natural", ["UTE"]),
+    "Carvão mineral": (0.002, "Fóssil", "Carvão Mineral", ["UTE"]),
+    "Urânio": (0.001, "Nuclear", "Nuclear", ["UTN"]),
+}
+# generator type: (median installed power in kW, sigma of its logarithm)
+GENERATOR_POWER = {
+    "UFV": (1000.0, 1.2),
+    "EOL": (30000.0, 0.8),
+    "UHE": (150000.0, 1.5),
+    "PCH": (12000.0, 0.6),
+    "CGH": (1000.0, 0.8),
+    "UTE": (2000.0, 1.8),
+    "UTN": (1300000.0, 0.3),
+}
+STATUSES = {"Operação": 0.85, "Construção não iniciada": 0.1, "Construção": 0.05}
+
+
+def _weighted_choice(rng: np.random.Generator, options: dict, size: int) -> np.ndarray:
+    """Draw the positions of the options, weighted by the first item of their values"""
+    weights = np.array(
+        [value[0] if isinstance(value, tuple) else value for value in options.values()]
+    )
+    return rng.choice(len(options), size=size, p=weights / weights.sum())
+
+
+def generate_plants(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a synthetic power plant dataset.
+
+    Args:
+        n_rows (int): Number of plants
+        seed (int): Seed of the random generator
+
+    Returns:
+        pd.DataFrame: Normalized dataset with the columns of config.data_column_names
+    """
+    rng = np.random.default_rng(seed)
+
+    state_names = np.array(list(STATES))
+    state_pos = _weighted_choice(rng, STATES, n_rows)
+    state_table = np.array([value[1:] for value in STATES.values()])
+    lat_center, lon_center, spread = state_table[state_pos].T
+
+    fuel_names = np.array(list(FUELS))
+    fuel_pos = _weighted_choice(rng, FUELS, n_rows)
+    fuel_origin = np.array([value[1] for value in FUELS.values()])[fuel_pos]
+    fuel_type = np.array([value[2] for value in FUELS.values()])[fuel_pos]
+
+    # generator type drawn among the ones of every fuel
+    generator_type = np.empty(n_rows, dtype=object)
+    for position, (_, _, _, generators) in enumerate(FUELS.values()):
+        rows = fuel_pos == position
+        generator_type[rows] = rng.choice(generators, size=rows.sum())
+    generator_type = generator_type.astype(str)
+
+    median_power = np.array([GENERATOR_POWER[g][0] for g in GENERATOR_POWER])
+    sigma_power = np.array([GENERATOR_POWER[g][1] for g in GENERATOR_POWER])
+    generator_pos = pd.Index(list(GENERATOR_POWER)).get_indexer(generator_type)
+    power_inst = np.round(
+        median_power[generator_pos]
+        * np.exp(sigma_power[generator_pos] * rng.standard_normal(n_rows)),
+        2,
+    )
+
+    # entry dates skewed to recent years, like the growth of distributed solar
+    days = (1 - rng.power(6, n_rows)) * (
+        pd.Timestamp("2024-12-31") - pd.Timestamp("1900-01-01")
+    ).days
+    entry_date = pd.Timestamp("2024-12-31") - pd.to_timedelta(
+        days.astype(np.int64), unit="D"
+    )
+
+    df = pd.DataFrame(
+        {
+            "NomEmpreendimento": np.char.add(
+                "Usina ", np.arange(n_rows).astype(str)
+            ).astype(object),
+            "status": np.array(list(STATUSES))[_weighted_choice(rng, STATUSES, n_rows)],
+            "states": state_names[state_pos],
+            "fuel_origin": fuel_origin,
+            "fuel_type": fuel_type,
+            "fuel_type_name": fuel_names[fuel_pos],
+            "generator_type": generator_type,
+            "DatEntradaOperacao": entry_date,
+            "latitude": lat_center + spread * rng.standard_normal(n_rows) / 2,
+            "longitude": lon_center + spread * rng.standard_normal(n_rows) / 2,
+            "electric_power_inst": power_inst,
+            "electric_power_decl": np.round(
+                power_inst * rng.uniform(0.8, 1.0, n_rows), 2
+            ),
+        }
+    )
+    return storage.normalize_dtypes(df)
+
+
+def generate_states() -> "gpd.GeoDataFrame":
+    """
+    Generate square state geometries around the centers used by generate_plants.
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame with an abbrev_state column, like the real geometries
+    """
+    import geopandas as gpd
+    import shapely
+
+    table = np.array([value[1:] for value in STATES.values()])
+    lat, lon, spread = table.T
+    return gpd.GeoDataFrame(
+        {"abbrev_state": list(STATES), "name_state": list(STATES)},
+        geometry=shapely.box(lon - spread, lat - spread, lon + spread, lat + spread),
+        crs="EPSG:4326",
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", type=int, default=100_000, help="number of plants")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generator")
+    parser.add_argument("--data-dir", required=True, help="directory of the snapshot")
+    args = parser.parse_args()
+
+    df = generate_plants(args.rows, args.seed)
+    version = storage.publish_snapshot(
+        df,
+        storage.initial_changelog(
+            df, storage.new_version(), f"synthetic:{args.rows}:{args.seed}"
+        ),
+        args.data_dir,
+    )
+    print(version, storage.snapshot_path(version, args.data_dir))
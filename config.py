@@ -1,9 +1,98 @@
-# file path to dataframe stored in github in pikle format
+import os
+
+# file path to dataframe stored in github in pikle format, only used as the source
+# for the first sync of the local snapshot
 csv_file_path = r"https://github.com/mmanoso/Brazilian-electric-matrix/blob/main/data/processed/transformed_data_app.pkl?raw=true"
 # file path to geojson file with data of brazil.
 geojson_file_path_state = r"https://github.com/mmanoso/Brazilian-electric-matrix/blob/main/data/processed/all_states.geojson?raw=true"
+# local directory where the dataset snapshot is materialized
+data_dir = os.environ.get(
+    "ELECTRIC_MATRIX_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"),
+)
+# directory where new vintages of the dataset are dropped to be ingested
+drop_dir = os.environ.get("ELECTRIC_MATRIX_DROP_DIR", os.path.join(data_dir, "drop"))
+# simplification tolerance in degrees of the cached state geometries by level
+geometry_levels = {"full": 0.0, "high": 0.005, "medium": 0.02, "low": 0.05}
+# resolution level of the state geometries used by each map
+map_geometry_levels = {"choropleth": "medium", "locations": "medium"}
+# decimals kept in the coordinates of the state geometries sent to the browser
+geometry_decimals = 3
+# directory served by streamlit at app/static, holds the shared geometry payloads
+static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# zoom levels with precomputed clusters of power plants in the location maps
+cluster_zoom_levels = [2, 3, 4, 5, 6]
+# side of the cluster cells in screen pixels
+cluster_cell_pixels = 40
+# location maps show raw points from this zoom level or up to this many plants
+cluster_max_zoom = 7
+cluster_point_threshold = 5000
+# circumradius in degrees of the hexagons of the density map by resolution
+hex_resolutions = {"coarse": 1.0, "medium": 0.5, "fine": 0.25}
+# send the numeric arrays of the figures as base64 typed arrays, needs plotly.js
+# 2.28 or later in the browser (bundled with streamlit)
+typed_arrays = os.environ.get("ELECTRIC_MATRIX_TYPED_ARRAYS", "1") == "1"
+# arrays shorter than this stay as number lists, encoding them saves nothing
+typed_array_min_length = 16
+# decimals kept in the latitudes and longitudes of the figures, about 1 m
+figure_coordinate_decimals = 5
+# rows per page of the grouped tables
+table_page_sizes = [50, 100, 500, 1000]
+# maximum number of figures kept in the process-wide figure cache
+figure_cache_size = 64
+# maximum number of filter selections whose rows are kept, shared by every session
+selection_cache_size = 128
+# time the stages of every run of the pages, sessions can also opt in with the
+# ?debug=timing query parameter; runs are only appended to the json-lines log
+# when timing is enabled here, not for sessions that opted in
+timing_enabled = os.environ.get("ELECTRIC_MATRIX_TIMING", "") == "1"
+timing_log_path = os.environ.get(
+    "ELECTRIC_MATRIX_TIMING_LOG", os.path.join(data_dir, "timing.jsonl")
+)
+# size in bytes at which the timing log is rotated to <timing_log_path>.1
+timing_log_max_bytes = int(
+    os.environ.get("ELECTRIC_MATRIX_TIMING_LOG_MAX_BYTES", 10_000_000)
+)
+# level of the reports logged by the app to the server console, e.g. the memory
+# of the datasets after normalizing their dtypes
+log_level = os.environ.get("ELECTRIC_MATRIX_LOG_LEVEL", "INFO")
+# columns that identify a power plant across dataset vintages, repeated keys are
+# matched in order of appearance
+plant_key_column_names = ["NomEmpreendimento", "states", "generator_type"]
+# columns of the dataset used by the app, only these are read from the snapshot
+data_column_names = [
+    "NomEmpreendimento",
+    "status",
+    "states",
+    "fuel_origin",
+    "fuel_type",
+    "fuel_type_name",
+    "generator_type",
+    "DatEntradaOperacao",
+    "latitude",
+    "longitude",
+    "electric_power_inst",
+    "electric_power_decl",
+]
+# columns stored as pandas categoricals, they have few distinct values
+categorical_column_names = [
+    "status",
+    "fuel_origin",
+    "fuel_type",
+    "fuel_type_name",
+    "generator_type",
+    "states",
+]
+# float columns always downcasted to float32, the rest only if it is lossless
+float32_column_names = ["latitude", "longitude"]
 # column names of interes to show in tables and graphs
 groupby_column_names = ["fuel_origin", "fuel_type", "fuel_type_name", "generator_type"]
+# category columns of the maps and the historical evolution
+map_category_column_names = ["fuel_origin", "generator_type"]
+# columns the net capacity change between two vintages is broken down by
+comparison_column_names = ["states", "fuel_origin"]
+# comparisons of dataset version pairs kept in memory
+comparison_cache_size = 4
 dynamic_filter_column_names = [
     "status",
     "fuel_origin",
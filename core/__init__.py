@@ -0,0 +1,5 @@
+"""
+Data engine of the app: dataset snapshots, filters, aggregations, geo
+aggregation and figures. Nothing in this package imports streamlit, so it runs
+in batch jobs (see precompute_func) as well as behind the pages.
+"""
@@ -0,0 +1,224 @@
+# import libraries
+import functools
+import hashlib
+import inspect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe cache of bounded size that evicts the least recently used entry.
+
+    Every session of the app runs in its own thread, the entries are shared by
+    all of them. Named caches are listed in caches, their hits and misses are
+    shown in the timing panel of the pages, see cache_stats.
+
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of entries.
+    name : str
+        Name of the cache in the registry, None if it is not registered.
+    hits : int
+        Number of lookups that found their key.
+    misses : int
+        Number of lookups that did not find their key.
+    """
+
+    def __init__(self, maxsize: int, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        if name is not None:
+            caches[name] = self
+
+    def get_or_create(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """
+        Get the value of a key, creating and storing it when it is missing.
+
+        The value is created outside of the lock, two sessions missing the same
+        key at once both build it and the last one is kept.
+
+        Args:
+            key (Hashable): Key of the entry
+            create (Callable[[], Any]): Function that creates the value
+
+        Returns:
+            Any: Cached or created value
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        value = create()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of entries, hits and misses"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# named process-wide caches, by name
+caches: Dict[str, LRUCache] = {}
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Get the number of entries, hits and misses of every named cache"""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+# process-wide cache of the figures built by visualization_func
+figure_cache = LRUCache(maxsize=config.figure_cache_size, name="figures")
+
+
+def canonical_filters(
+    filters: Optional[Dict[str, List[Any]]],
+) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """
+    Get a hashable form of a filter selection that does not depend on its order.
+
+    Args:
+        filters (Optional[Dict[str, List[Any]]]): Selected values by column, empty lists select everything
+
+    Returns:
+        Tuple[Tuple[str, Tuple[str, ...]], ...]: Active filters sorted by column, with sorted values
+    """
+    return tuple(
+        (column, tuple(sorted(map(str, values))))
+        for column, values in sorted((filters or {}).items())
+        if values
+    )
+
+
+def tag_frame(df: pd.DataFrame, token: Hashable) -> pd.DataFrame:
+    """
+    Attach a lineage token to a dataframe derived from the shared dataset.
+
+    The token is an attribute of the dataframe object, it is not in the pandas
+    metadata, so frames derived from a tagged one do not inherit it.
+
+    Args:
+        df (pd.DataFrame): Derived dataframe, must not be modified afterwards
+        token (Hashable): Token of the data, e.g. version, filters and group-by columns
+
+    Returns:
+        pd.DataFrame: The same dataframe
+    """
+    # object.__setattr__ skips the column assignment of pandas and the guard
+    # of storage_func.ReadOnlyDataFrame
+    object.__setattr__(df, "_lineage_token", token)
+    return df
+
+
+def content_token(df: pd.DataFrame) -> Tuple[str, str]:
+    """
+    Get a token of the content of a dataframe, a digest of the hashes of its rows.
+
+    Args:
+        df (pd.DataFrame): DataFrame to get the token of
+
+    Returns:
+        Tuple[str, str]: "content" and the hex digest
+    """
+    digest = hashlib.sha1(
+        pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()
+    )
+    digest.update(repr(tuple(df.columns)).encode())
+    return ("content", digest.hexdigest())
+
+
+def frame_token(df: pd.DataFrame) -> Hashable:
+    """
+    Get a cheap cache key for the content of a dataframe.
+
+    Tagged dataframes use their lineage token and shared datasets their version,
+    any other dataframe falls back to hashing its content.
+
+    Args:
+        df (pd.DataFrame): DataFrame to get the token of
+
+    Returns:
+        Hashable: Token of the dataframe
+    """
+    token = getattr(df, "_lineage_token", None) or getattr(df, "version", None)
+    if token is not None:
+        return token
+    return content_token(df)
+
+
+def geometry_token(geodf: pd.DataFrame) -> Hashable:
+    """Get the level and build time of shared state geometries, a digest of their content otherwise"""
+    token = geodf.attrs.get("geometry_token")
+    if token:
+        return token
+    geometry = geodf.geometry
+    digest = hashlib.sha1(b"".join(geometry.to_wkb()))
+    digest.update(content_token(geodf.drop(columns=geometry.name))[1].encode())
+    return ("content", digest.hexdigest())
+
+
+def cache_figure(key_func: Callable[..., Hashable], cache: LRUCache = None):
+    """
+    Cache the figures of a builder by a cheap key instead of hashing its frames.
+
+    key_func gets the arguments of the builder by name (defaults applied) and
+    returns the key, made of dataset and geometry tokens plus the scalar
+    parameters. Cached figures are shared by every session, callers must not
+    modify them.
+
+    Args:
+        key_func (Callable[..., Hashable]): Function that builds the key from the arguments
+        cache (LRUCache): Cache of the figures, defaults to figure_cache
+
+    Returns:
+        Callable: Decorator of figure builders
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__, key_func(**bound.arguments))
+            return (cache or figure_cache).get_or_create(
+                key, lambda: func(*bound.args, **bound.kwargs)
+            )
+
+        return wrapper
+
+    return decorator
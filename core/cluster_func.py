@@ -0,0 +1,277 @@
+# import libraries
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+
+
+def cell_size(zoom: float, cell_pixels: int = None) -> float:
+    """
+    Get the side in degrees of the clustering grid cells at a zoom level.
+
+    At zoom z a web map is 256 * 2**z pixels wide for 360 degrees, cells are
+    cell_pixels wide on screen at every zoom level.
+
+    Args:
+        zoom (float): Map zoom level
+        cell_pixels (int): Side of the cells in screen pixels, defaults to config.cluster_cell_pixels
+
+    Returns:
+        float: Side of the cells in degrees
+    """
+    cell_pixels = cell_pixels or config.cluster_cell_pixels
+    return 360.0 / (256 * 2**zoom) * cell_pixels
+
+
+def power_breakdown(
+    cell_codes: np.ndarray,
+    n_cells: int,
+    category_codes: np.ndarray,
+    categories: pd.Index,
+    power: np.ndarray,
+) -> pd.DataFrame:
+    """
+    Sum the power of the plants by cell and category.
+
+    Every (cell, category) pair gets one slot of a flat array, so the sums are
+    a single bincount. Plants without category are left out.
+
+    Args:
+        cell_codes (np.ndarray): Cell code of every plant
+        n_cells (int): Number of cells
+        category_codes (np.ndarray): Category code of every plant, -1 without category
+        categories (pd.Index): Categories, in code order
+        power (np.ndarray): Power of every plant
+
+    Returns:
+        pd.DataFrame: Power by cell (rows) and category (columns)
+    """
+    n_categories = max(len(categories), 1)
+    has_category = category_codes >= 0
+    breakdown = np.bincount(
+        cell_codes[has_category] * n_categories + category_codes[has_category],
+        weights=power[has_category],
+        minlength=n_cells * n_categories,
+    ).reshape(n_cells, n_categories)[:, : len(categories)]
+    return pd.DataFrame(breakdown, columns=list(categories))
+
+
+def grid_clusters(
+    df: pd.DataFrame, category: str, zoom: float, cell_pixels: int = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Group the power plants in the cells of a regular grid sized for a zoom level.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        category (str): Column used for the breakdown of the power of each cluster
+        zoom (float): Map zoom level
+        cell_pixels (int): Side of the cells in screen pixels, defaults to config.cluster_cell_pixels
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Clusters with their mean location,
+        number of plants, summed power and dominant category, and the power of
+        every cluster by category (one column per category)
+    """
+    lat = df["latitude"].to_numpy(np.float64)
+    lon = df["longitude"].to_numpy(np.float64)
+    power = np.nan_to_num(df["electric_power_inst"].to_numpy(np.float64))
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon, power = lat[valid], lon[valid], power[valid]
+    category_codes, categories = pd.factorize(df[category].to_numpy()[valid])
+
+    # one integer key per grid cell, cells are numbered in order of appearance
+    size = cell_size(zoom, cell_pixels)
+    cell_x = np.floor(lon / size).astype(np.int64)
+    cell_y = np.floor(lat / size).astype(np.int64)
+    cell_codes, cell_keys = pd.factorize(cell_x * (1 << 32) + cell_y)
+    n_cells = len(cell_keys)
+
+    plant_count = np.bincount(cell_codes, minlength=n_cells)
+    clusters = pd.DataFrame(
+        {
+            "latitude": np.bincount(cell_codes, weights=lat, minlength=n_cells)
+            / plant_count,
+            "longitude": np.bincount(cell_codes, weights=lon, minlength=n_cells)
+            / plant_count,
+            "plant_count": plant_count,
+            "electric_power_inst": np.bincount(
+                cell_codes, weights=power, minlength=n_cells
+            ),
+        }
+    )
+
+    breakdown = power_breakdown(cell_codes, n_cells, category_codes, categories, power)
+    clusters["dominant"] = (
+        breakdown.idxmax(axis=1) if len(categories) else pd.Series(dtype=object)
+    )
+    return clusters, breakdown
+
+
+def cluster_levels(
+    df: pd.DataFrame, category: str, zooms: List[int] = None
+) -> Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Precompute the grid clusters of the power plants at every zoom level.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        category (str): Column used for the breakdown of the power of each cluster
+        zooms (List[int]): Zoom levels, defaults to config.cluster_zoom_levels
+
+    Returns:
+        Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]: Result of grid_clusters by zoom level
+    """
+    zooms = zooms or config.cluster_zoom_levels
+    return {zoom: grid_clusters(df, category, zoom) for zoom in zooms}
+
+
+def nearest_level(zoom: float, zooms: List[int] = None) -> int:
+    """Get the precomputed zoom level to use for a map zoom"""
+    zooms = sorted(zooms or config.cluster_zoom_levels)
+    candidates = [level for level in zooms if level <= zoom]
+    return candidates[-1] if candidates else zooms[0]
+
+
+def hex_axial(
+    lat: np.ndarray, lon: np.ndarray, size: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the axial coordinates of the pointy-top hexagons holding some points.
+
+    Points are converted to fractional cube coordinates and rounded to the
+    nearest hexagon, fixing the coordinate with the largest rounding error so
+    the three cube coordinates still add up to zero.
+
+    Args:
+        lat (np.ndarray): Latitude of the points
+        lon (np.ndarray): Longitude of the points
+        size (float): Circumradius of the hexagons in degrees
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Axial coordinates q and r of every point
+    """
+    q = (np.sqrt(3) / 3 * lon - lat / 3) / size
+    r = (2 / 3 * lat) / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hex_polygons(q: np.ndarray, r: np.ndarray, size: float) -> np.ndarray:
+    """
+    Get the vertices of pointy-top hexagons from their axial coordinates.
+
+    Args:
+        q (np.ndarray): Axial q coordinate of the hexagons
+        r (np.ndarray): Axial r coordinate of the hexagons
+        size (float): Circumradius of the hexagons in degrees
+
+    Returns:
+        np.ndarray: Closed rings of lon/lat vertices, with shape (n, 7, 2)
+    """
+    center_lon = size * np.sqrt(3) * (q + r / 2)
+    center_lat = size * 1.5 * r
+    angles = np.radians(30 + 60 * np.arange(7))
+    return np.stack(
+        [
+            center_lon[:, None] + size * np.cos(angles),
+            center_lat[:, None] + size * np.sin(angles),
+        ],
+        axis=-1,
+    )
+
+
+def hex_grid(df: pd.DataFrame, size: float) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Assign every power plant to a cell of a hexagonal grid.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        size (float): Circumradius of the hexagons in degrees
+
+    Returns:
+        Tuple[np.ndarray, pd.DataFrame]: Cell code of every row (-1 without
+        location) and the axial coordinates q and r of every cell
+    """
+    lat = df["latitude"].to_numpy(np.float64)
+    lon = df["longitude"].to_numpy(np.float64)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    q, r = hex_axial(lat[valid], lon[valid], size)
+    codes = np.full(len(df), -1, dtype=np.int64)
+    codes[valid], cell_keys = pd.factorize(q * (1 << 32) + (r & 0xFFFFFFFF))
+    cell_keys = np.asarray(cell_keys)
+    cells = pd.DataFrame({"q": cell_keys >> 32, "r": (cell_keys << 32) >> 32})
+    return codes, cells
+
+
+def hex_density(
+    df: pd.DataFrame,
+    codes: np.ndarray,
+    n_cells: int,
+    status: str,
+    category: str,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Sum the installed power of the plants with a status in every hexagon.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        codes (np.ndarray): Cell code of every row, from hex_grid
+        n_cells (int): Number of cells of the grid
+        status (str): Status of the plants
+        category (str): Column used for the breakdown of the power of each cell
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Number of plants and summed power of
+        the non-empty cells (indexed by cell code), and their power by category
+    """
+    selected = (df["status"] == status).to_numpy() & (codes >= 0)
+    cell_codes = codes[selected]
+    power = np.nan_to_num(df["electric_power_inst"].to_numpy(np.float64)[selected])
+    category_codes, categories = pd.factorize(df[category].to_numpy()[selected])
+
+    density = pd.DataFrame(
+        {
+            "plant_count": np.bincount(cell_codes, minlength=n_cells),
+            "electric_power_inst": np.bincount(
+                cell_codes, weights=power, minlength=n_cells
+            ),
+        }
+    )
+    breakdown = power_breakdown(cell_codes, n_cells, category_codes, categories, power)
+
+    non_empty = density["plant_count"].to_numpy() > 0
+    return density[non_empty], breakdown[non_empty]
+
+
+def hex_density_cells(
+    df: pd.DataFrame,
+    codes: np.ndarray,
+    cells: pd.DataFrame,
+    status: str,
+    category: str,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Get the non-empty cells of a hexagonal grid with the power of a status.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        codes (np.ndarray): Cell code of every row, from hex_grid
+        cells (pd.DataFrame): Axial coordinates of every cell, from hex_grid
+        status (str): Status of the plants
+        category (str): Column used for the breakdown of the power of each cell
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Axial coordinates, number of plants
+        and summed power of the non-empty cells, and their power by category
+    """
+    density, breakdown = hex_density(df, codes, len(cells), status, category)
+    return cells.iloc[density.index].join(density), breakdown
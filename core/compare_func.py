@@ -0,0 +1,209 @@
+# import libraries
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+from core import storage_func as storage
+from core.refresh_func import diff_snapshots
+
+logger = logging.getLogger(__name__)
+
+# columns of the plants listed in the comparison, after the plant key
+plant_column_names = ["status", "fuel_origin", "fuel_type", "electric_power_inst"]
+
+
+def plant_rows(keyed: pd.DataFrame, key_columns: List[str]) -> pd.DataFrame:
+    """Get the plants of a key-indexed frame of diff_snapshots with the key as columns"""
+    rows = keyed.reset_index()
+    return rows[key_columns + [c for c in plant_column_names if c in rows.columns]]
+
+
+def status_transitions(
+    diff: Dict[str, Any], key_columns: List[str]
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Get the plants whose status changed between two vintages.
+
+    Args:
+        diff (Dict[str, Any]): Result of refresh_func.diff_snapshots
+        key_columns (List[str]): Columns that identify a plant
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Number of plants and installed power of
+        every status transition, and the plants that moved with their old and new status
+    """
+    old_status = diff["changed_old"]["status"].astype(object)
+    new_status = diff["changed_new"]["status"].astype(object)
+    moved = (
+        (old_status != new_status) & ~(old_status.isna() & new_status.isna())
+    ).to_numpy()
+
+    plants = plant_rows(diff["changed_new"][moved], key_columns).drop(columns="status")
+    plants.insert(len(key_columns), "status_from", old_status.to_numpy()[moved])
+    plants.insert(len(key_columns) + 1, "status_to", new_status.to_numpy()[moved])
+
+    transitions = (
+        plants.groupby(["status_from", "status_to"], sort=False)
+        .agg(
+            plants=("status_to", "size"),
+            electric_power_inst=("electric_power_inst", "sum"),
+        )
+        .reset_index()
+        .sort_values("electric_power_inst", ascending=False, ignore_index=True)
+    )
+    return transitions, plants
+
+
+def net_capacity(old: pd.DataFrame, new: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    Get the installed power of two vintages by a column and status, and its change.
+
+    Args:
+        old (pd.DataFrame): Base vintage of the dataset
+        new (pd.DataFrame): Compared vintage of the dataset
+        column (str): Column to break the power down by, e.g. "states"
+
+    Returns:
+        pd.DataFrame: Old, new and net installed power by column value and status
+    """
+
+    def capacity(df: pd.DataFrame) -> pd.Series:
+        # object keys, the categories of the two vintages may differ
+        keys = [df[name].astype(object) for name in [column, "status"]]
+        return df["electric_power_inst"].groupby(keys).sum()
+
+    frame = pd.concat({"old": capacity(old), "new": capacity(new)}, axis=1)
+    frame = frame.fillna(0.0)
+    frame["net"] = frame["new"] - frame["old"]
+    return frame.rename_axis([column, "status"]).reset_index()
+
+
+def net_capacity_totals(
+    net: pd.DataFrame, column: str, status: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Sum the net capacity of net_capacity over the statuses.
+
+    Args:
+        net (pd.DataFrame): Result of net_capacity
+        column (str): Column the power is broken down by
+        status (Optional[str]): Status to keep, every status if None
+
+    Returns:
+        pd.DataFrame: Old, new and net installed power by column value, sorted by net change
+    """
+    if status is not None:
+        net = net[net["status"] == status]
+    # rounded to watts, sums in a different order leave residues in the net;
+    # the column is categorical in the frozen frames shared by the app
+    return (
+        net.groupby(column, sort=False, observed=True)[["old", "new", "net"]]
+        .sum()
+        .round(3)
+        .add(0.0)
+        .reset_index()
+        .sort_values("net", ignore_index=True)
+    )
+
+
+def compare_vintages(
+    old: pd.DataFrame,
+    new: pd.DataFrame,
+    key_columns: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Compare two vintages of the dataset by plant key.
+
+    The vintages are joined on their plant key index (see refresh_func.key_index),
+    so the comparison is a handful of vectorized index operations.
+
+    Args:
+        old (pd.DataFrame): Base vintage of the dataset
+        new (pd.DataFrame): Compared vintage of the dataset
+        key_columns (Optional[List[str]]): Columns that identify a plant, defaults to config.plant_key_column_names
+        columns (Optional[List[str]]): Columns of the net capacity, defaults to config.comparison_column_names
+
+    Returns:
+        Dict[str, Any]: Added and removed plants, status transitions and the plants
+        that moved, number of changes by column and net capacity by column
+    """
+    key_columns = key_columns or config.plant_key_column_names
+    columns = columns or config.comparison_column_names
+    diff = diff_snapshots(old, new, key_columns)
+    transitions, transitioned = status_transitions(diff, key_columns)
+    return {
+        "added": plant_rows(diff["added"], key_columns),
+        "removed": plant_rows(diff["removed"], key_columns),
+        "transitions": transitions,
+        "transitioned": transitioned,
+        "changed_columns": diff["changed_columns"],
+        "net_capacity": {column: net_capacity(old, new, column) for column in columns},
+    }
+
+
+def compare_versions(
+    old_version: str, new_version: str, data_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Compare two dataset versions, read from their columnar snapshots.
+
+    Args:
+        old_version (str): Base dataset version
+        new_version (str): Compared dataset version
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        Dict[str, Any]: Comparison, see compare_vintages
+    """
+    start = time.perf_counter()
+    comparison = compare_vintages(
+        storage.load_dataset(old_version, data_dir),
+        storage.load_dataset(new_version, data_dir),
+    )
+    logger.info(
+        "compared versions %s and %s in %.2f s",
+        old_version,
+        new_version,
+        time.perf_counter() - start,
+    )
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare two dataset versions by plant key."
+    )
+    parser.add_argument(
+        "old_version", nargs="?", help="base version, the previous one by default"
+    )
+    parser.add_argument(
+        "new_version", nargs="?", help="compared version, the current one by default"
+    )
+    parser.add_argument("--data-dir", help="directory where the snapshots are stored")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    versions = storage.list_versions(args.data_dir)
+    new_version = args.new_version or storage.current_version(args.data_dir)
+    old_version = args.old_version or (
+        versions[versions.index(new_version) - 1]
+        if new_version in versions[1:]
+        else None
+    )
+    if old_version is None or new_version is None:
+        parser.error("two dataset versions are needed to compare")
+
+    comparison = compare_versions(old_version, new_version, args.data_dir)
+    print(
+        f"{old_version} -> {new_version}: {len(comparison['added'])} added, "
+        f"{len(comparison['removed'])} removed, "
+        f"{len(comparison['transitioned'])} changed status"
+    )
+    print(comparison["transitions"].to_string(index=False))
+    for column, net in comparison["net_capacity"].items():
+        print(net_capacity_totals(net, column).to_string(index=False))
@@ -0,0 +1,245 @@
+# import libraries
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# measures kept in every cell of the cube
+cube_measure_columns = ["electric_power_inst", "electric_power_decl", "plant_count"]
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pre-aggregate the dataset over every filter column.
+
+    Each row (cell) of the cube holds the installed and declared power and the
+    number of plants of one combination of status, states, fuel columns and
+    generator type. Every filter and group-by of the app can be answered from it.
+    Plants with missing values in the filter columns keep their own cells.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+
+    Returns:
+        pd.DataFrame: Aggregation cube, one row per non-empty combination
+    """
+    cube = (
+        df.groupby(config.dynamic_filter_column_names, observed=True, dropna=False)
+        .agg(
+            electric_power_inst=("electric_power_inst", "sum"),
+            electric_power_decl=("electric_power_decl", "sum"),
+            plant_count=("electric_power_inst", "size"),
+        )
+        .reset_index()
+    )
+    check_cube(cube, df)
+    return cube
+
+
+def check_cube(cube: pd.DataFrame, df: pd.DataFrame) -> None:
+    """
+    Check that the measures of a cube add up to the totals of its plants.
+
+    Args:
+        cube (pd.DataFrame): Aggregation cube from build_cube
+        df (pd.DataFrame): DataFrame with the power plants the cube was built from
+
+    Raises:
+        ValueError: If a plant is missing from the cube or counted twice
+    """
+    if int(cube["plant_count"].sum()) != len(df):
+        raise ValueError(
+            f"The cube holds {int(cube['plant_count'].sum())} plants, the dataset {len(df)}"
+        )
+    for measure in ["electric_power_inst", "electric_power_decl"]:
+        cube_total, plant_total = cube[measure].sum(), df[measure].sum()
+        if not np.isclose(cube_total, plant_total, rtol=1e-9, atol=1e-6):
+            raise ValueError(
+                f"The cube sums {cube_total} of {measure}, the dataset {plant_total}"
+            )
+
+
+def filter_cube(
+    cube: pd.DataFrame, filters: Optional[Dict[str, List[str]]] = None
+) -> pd.DataFrame:
+    """
+    Keep the cells of the cube that match the selected filters.
+
+    Args:
+        cube (pd.DataFrame): Aggregation cube from build_cube
+        filters (Optional[Dict[str, List[str]]]): Selected values by column, empty lists select everything
+
+    Returns:
+        pd.DataFrame: Filtered cube
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values:
+            mask &= cube[column].isin(values).to_numpy()
+    return cube[mask]
+
+
+def rollup(
+    cube: pd.DataFrame,
+    category: Union[str, List[str]],
+    filters: Optional[Dict[str, List[str]]] = None,
+    measures: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Filter the cube and sum its measures by a category, like groupby_func_to_df
+    over the filtered plants but scanning cube cells instead of plant rows.
+
+    Args:
+        cube (pd.DataFrame): Aggregation cube from build_cube
+        category (Union[str, List[str]]): Column(s) to group by
+        filters (Optional[Dict[str, List[str]]]): Selected values by column
+        measures (Optional[List[str]]): Measures to sum, installed power by default
+
+    Returns:
+        pd.DataFrame: Grouped DataFrame
+    """
+    measures = measures or ["electric_power_inst"]
+    return (
+        filter_cube(cube, filters)
+        .groupby(category, observed=True)
+        .agg({measure: "sum" for measure in measures})
+        .reset_index()
+    )
+
+
+def status_totals(cube: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sum every measure of the cube by status.
+
+    Args:
+        cube (pd.DataFrame): Aggregation cube from build_cube
+
+    Returns:
+        pd.DataFrame: Measures indexed by status
+    """
+    return cube.groupby("status", observed=True)[cube_measure_columns].sum()
+
+
+def cumulative_power_by_year(
+    df: pd.DataFrame, category: str, categories: List[str], status: str = "Operação"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the installed power accumulated every year by category as a dense matrix.
+
+    Entry years are binned to offsets from the first year and the power of every
+    plant is added to its (year, category) cell, the cumulative sum along the
+    years gives the installed power at the end of every year. Years without new
+    plants keep the total of the previous year.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        category (str): Column to break the power down by
+        categories (List[str]): Categories of the columns of the matrix, in order
+        status (str): Status of the plants taken into account
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Years (first to last entry year) and the
+        cumulative power matrix with shape (years, categories)
+    """
+    selected = df[df["status"] == status]
+    years = selected["DatEntradaOperacao"].dt.year.to_numpy(np.float64)
+    category_codes = pd.Index(categories).get_indexer(selected[category])
+    power = np.nan_to_num(selected["electric_power_inst"].to_numpy(np.float64))
+
+    valid = ~np.isnan(years) & (category_codes >= 0)
+    if not valid.any():
+        return np.array([], dtype=np.int64), np.zeros((0, len(categories)))
+    years = years[valid].astype(np.int64)
+    first_year = years.min()
+
+    matrix = np.zeros((years.max() - first_year + 1, len(categories)))
+    np.add.at(matrix, (years - first_year, category_codes[valid]), power[valid])
+    return np.arange(first_year, years.max() + 1), np.cumsum(matrix, axis=0)
+
+
+def sort_key(values: pd.Series, ascending: bool = True) -> np.ndarray:
+    """
+    Get a float key whose ascending order is the requested order of a column.
+
+    Text and categorical columns are ranked by their sorted distinct values,
+    descending orders negate the key and missing values always sort last.
+
+    Args:
+        values (pd.Series): Column to sort by
+        ascending (bool): Sort order
+
+    Returns:
+        np.ndarray: Sort key of every row
+    """
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(
+        values.dtype, pd.CategoricalDtype
+    ):
+        key = values.to_numpy(np.float64, na_value=np.nan)
+    else:
+        codes, _ = pd.factorize(values.astype(str).where(values.notna()), sort=True)
+        key = np.where(codes >= 0, codes, np.nan).astype(np.float64)
+    if not ascending:
+        key = -key
+    return np.nan_to_num(key, nan=np.inf)
+
+
+def top_positions(key: np.ndarray, stop: int) -> np.ndarray:
+    """
+    Get the positions of the first rows in the ascending order of a sort key.
+
+    Only the rows up to stop are sorted: argpartition selects them in linear
+    time and they are sorted among themselves, ties by position.
+
+    Args:
+        key (np.ndarray): Sort key of every row
+        stop (int): Number of rows
+
+    Returns:
+        np.ndarray: Positions of the first stop rows, in order
+    """
+    stop = min(stop, len(key))
+    if stop <= 0:
+        return np.array([], dtype=np.int64)
+    if stop < len(key):
+        positions = np.sort(np.argpartition(key, stop - 1)[:stop])
+    else:
+        positions = np.arange(len(key))
+    return positions[np.argsort(key[positions], kind="stable")]
+
+
+def table_page(
+    df: pd.DataFrame,
+    sort_column: str,
+    ascending: bool,
+    page: int,
+    page_size: int,
+    top_n: Optional[int] = None,
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Get a page of a table in a sort order without sorting the whole table.
+
+    With top_n only the top_n rows with the most installed power are kept,
+    before sorting them by the sort column.
+
+    Args:
+        df (pd.DataFrame): Table, e.g. a rollup with an electric_power_inst column
+        sort_column (str): Column to sort by
+        ascending (bool): Sort order
+        page (int): Page number, from 0
+        page_size (int): Rows per page
+        top_n (Optional[int]): Keep only the rows with the most power, all rows if None or 0
+
+    Returns:
+        Tuple[pd.DataFrame, int]: Rows of the page and number of rows of the table
+    """
+    candidates = np.arange(len(df))
+    if top_n and top_n < len(df):
+        candidates = top_positions(
+            sort_key(df["electric_power_inst"], ascending=False), top_n
+        )
+    start = page * page_size
+    key = sort_key(df[sort_column].iloc[candidates], ascending)
+    positions = top_positions(key, start + page_size)[start:]
+    return df.iloc[candidates[positions]], len(candidates)
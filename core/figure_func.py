@@ -0,0 +1,633 @@
+# import libraries
+# plotly.express and geopandas are slow to import, plotly.express is imported
+# inside the functions that build figures with it and geopandas only for typing
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.colors as pc
+import plotly.graph_objects as go
+
+import config
+from core import cluster_func, cube_func
+from core.payload_func import optimize_figure
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+logger = logging.getLogger(__name__)
+
+
+# define function for manage colors in graphs
+def generate_color_dict_plotly(categories: List[str], colormap: str) -> Dict[str, str]:
+    """
+    Create a color dictionary for given variables using a specified Plotly color palette.
+
+    Args:
+        categories (List[str]): List of category names
+        colormap (str): Name of the Plotly qualitative color palette to use
+
+    Returns:
+    Dict[str, str]: Dictionary mapping categories to colors
+    """
+    try:
+        colors = getattr(pc.qualitative, colormap)
+    except AttributeError:
+        logger.warning(
+            "Palette '%s' not found. Using default 'Plotly' palette.", colormap
+        )
+        colors = pc.qualitative.Plotly
+
+    return {category: colors[i % len(colors)] for i, category in enumerate(categories)}
+
+
+# define function for display choropleth map
+def choropleth_mapbox_ele_pow(
+    df: pd.DataFrame, geojson: Any, status: str, colors_scale: str
+) -> go.Figure:
+    """
+    Create a choropleth map of electric power by state.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing power plant data
+        geojson (Any): State boundaries, GeoJSON dict or url, features keyed by state abbreviation
+        status (str): Status of power plants to display
+        colors_scale (str): Color scale for the choropleth map
+
+    Returns:
+        go.Figure: Plotly figure object containing the choropleth map
+    """
+    # # read procesed data
+    # csv_file_path = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\transformed_data.pkl"
+    # df_aux = pd.read_pickle(csv_file_path)
+
+    # # read geojson data
+    # geojson_file_path_state = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\all_states.geojson"
+    # geojson_data_state = gpd.read_file(geojson_file_path_state)
+
+    # make dataframe for map
+    df_sorted = (
+        df[df["status"] == status]
+        .groupby("states", observed=True)
+        .agg({"electric_power_inst": "sum", "electric_power_decl": "sum"})
+        .reset_index()
+    )
+
+    # get better color for limits of the range in the color map
+    key_min = np.percentile(df_sorted.electric_power_inst, 5)
+    key_max = np.percentile(df_sorted.electric_power_inst, 95)
+
+    # get the center of brazil to display by default
+    # state_bounds = geojson_data_state.geometry.total_bounds
+    # south, west, north, east = state_bounds
+
+    # Calculate the center coordinates
+    # center = {"lat": (south + north) / 2, "lon": (west + east) / 2}
+    center = {"lat": -11.61, "lon": -51.81}
+    # Calculate the zoom level
+    zoom = 2.3  # Start with a zoom level of 4 (can be adjusted as needed)
+
+    import plotly.express as px
+
+    # create choropleth map
+    fig = px.choropleth_mapbox(
+        df_sorted,
+        geojson=geojson,
+        locations="states",
+        featureidkey="properties.abbrev_state",
+        color="electric_power_inst",
+        color_continuous_scale=colors_scale,
+        mapbox_style="carto-darkmatter",
+        range_color=[key_min, key_max],
+        center=center,
+        zoom=zoom,
+        opacity=1,
+        labels={"electric_power_inst": "Electric Power KW"},
+        # title=f"Electric Power by State by {status}",
+    )
+    fig.update_geos(fitbounds="locations", visible=False, scope="south america")
+
+    # update layout atributes
+    fig.update_layout(
+        mapbox=dict(style="carto-darkmatter"),
+        # paper_bgcolor="#343a40",
+        # plot_bgcolor="#343a40",
+        # font_color="white",
+        legend=dict(title=dict(text="Legend Title"), orientation="h", x=1, y=1.02),
+    )
+
+    return optimize_figure(fig)
+
+
+# define bar plot by status and category
+def bar_plot_status_category(
+    df: pd.DataFrame, category: str, color_dict: Dict[str, str]
+) -> go.Figure:
+    """
+    Create a bar plot of electric power by category.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing grouped data
+        category (str): Category to plot
+        color_dict (Dict[str, str]): Dictionary mapping categories to colors
+
+    Returns:
+        go.Figure: Plotly figure object containing the bar plot
+    """
+    # make sorted dataframe
+    df_sorted = (
+        df.groupby(category, observed=True)
+        .agg({"electric_power_inst": "sum"})
+        .reset_index()
+    )
+
+    import plotly.express as px
+
+    # make bar graph
+    fig = px.bar(
+        df_sorted,
+        x=category,
+        y=df_sorted["electric_power_inst"] / 1000,
+        color=category,
+        color_discrete_map=color_dict,
+        # title=f"Electric power by {status} and by {category}",
+        labels={category: category, "y": "Electric Power (MW)"},
+    )
+    fig.update_layout(
+        legend_title=None,
+        showlegend=True,
+        xaxis_title=None,
+    )
+    fig.update_xaxes(tickangle=45)
+
+    return fig
+
+
+# #define pie plot by status and category
+def pie_plot_status_category(
+    df: pd.DataFrame, category: str, color_dict: Dict[str, str]
+) -> go.Figure:
+    """
+    Create a pie plot of electric power by category.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing grouped data
+        category (str): Category to plot
+        color_dict (Dict[str, str]): Dictionary mapping categories to colors
+
+    Returns:
+        go.Figure: Plotly figure object containing the bar plot
+    """
+    # make sorted dataframe
+    df_sorted = (
+        df.groupby(category, observed=True)
+        .agg({"electric_power_inst": "sum"})
+        .reset_index()
+    )
+
+    import plotly.express as px
+
+    # plot the pie graph
+    fig = px.pie(
+        df_sorted,
+        values="electric_power_inst",
+        names=category,
+        # title=f"Electric Power by {status} and by {category}",
+        color=category,
+        color_discrete_map=color_dict,
+        labels={category: category, "electric_power_inst": "Electric Power (KW)"},
+    )
+
+    fig.update_layout(showlegend=False)
+
+    return fig
+
+
+# accumulate the installed power of the operative plants by year and category
+def historic_power(
+    df: pd.DataFrame, category: str
+) -> Tuple[List[Any], np.ndarray, np.ndarray]:
+    """
+    Get the installed power of the operative plants accumulated by year and category.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        category (str): Column to break the power down by
+
+    Returns:
+        Tuple[List[Any], np.ndarray, np.ndarray]: Categories, years and cumulative
+        power matrix with shape (years, categories)
+    """
+    categories = df[category].unique().tolist()
+    years, matrix = cube_func.cumulative_power_by_year(df, category, categories)
+    return categories, years, matrix
+
+
+# define historical evolution plot of the installed power
+def hist_line_plot(
+    history: Tuple[List[Any], np.ndarray, np.ndarray], category: str, color_scale: str
+) -> go.Figure:
+    """
+    Create a stacked area chart of the installed power of operative plants over time.
+
+    Args:
+        history (Tuple[List[Any], np.ndarray, np.ndarray]): Categories, years and cumulative power, see historic_power
+        category (str): Column to break the power down by
+        color_scale (str): Name of the Plotly qualitative color palette to use
+
+    Returns:
+        go.Figure: Plotly figure
+    """
+    categories, years, matrix = history
+
+    # generate colors for graph
+    color_dict = generate_color_dict_plotly(categories=categories, colormap=color_scale)
+
+    # Create the stacked area chart, one trace per category column of the matrix
+    fig = go.Figure(
+        [
+            go.Scatter(
+                x=years,
+                y=matrix[:, position],
+                name=str(cat),
+                legendgroup=str(cat),
+                mode="lines",
+                stackgroup="one",
+                line=dict(color=color_dict.get(cat, "#000000")),
+                hovertemplate=f"{category}={cat}<br>Year=%{{x}}"
+                "<br>Installed Power (kW)=%{y}<extra></extra>",
+            )
+            for position, cat in enumerate(categories)
+        ]
+    )
+
+    # Customize the layout
+    fig.update_layout(
+        xaxis_title="Year",
+        yaxis_title="Total Installed Power (kW)",
+        legend_title=category,
+        hovermode="x unified",
+        # paper_bgcolor="#343a40",
+        # plot_bgcolor="#343a40",
+        # font_color="white",
+    )
+
+    return optimize_figure(fig)
+
+
+def build_point_layer(
+    df: pd.DataFrame,
+    category: str,
+    categories: List[str],
+    color_dict: Dict[str, str],
+) -> List[go.Scattermapbox]:
+    """
+    Create the point layer of the power plants locations.
+
+    Every plant goes in a single WebGL trace with its color given per point, so
+    the plants are partitioned by category in one pass over the category codes
+    instead of one scan per category. The legend is made of empty traces, one
+    per category, with the same colors.
+
+    The hover label is formatted in the browser by a hover template, only the
+    names are sent as text and the power as a numeric array, which the payload
+    optimizer encodes as a typed array with the coordinates.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants to display
+        category (str): Column used to color the points
+        categories (List[str]): Categories shown in the legend, in order
+        color_dict (Dict[str, str]): Dictionary mapping categories to colors
+
+    Returns:
+        List[go.Scattermapbox]: Point trace followed by the legend traces
+    """
+    codes, uniques = pd.factorize(df[category], sort=False)
+    palette = [color_dict.get(cat, "#000000") for cat in uniques] or ["#000000"]
+    # the point colors are the category codes mapped through a stepped color
+    # scale, numeric arrays are validated and serialized much faster than colors
+    n_colors = len(palette)
+    colorscale = [
+        [bound / n_colors, color]
+        for position, color in enumerate(palette)
+        for bound in (position, position + 1)
+    ]
+
+    traces = [
+        go.Scattermapbox(
+            lat=df["latitude"],
+            lon=df["longitude"],
+            mode="markers",
+            marker=dict(
+                size=5,
+                color=codes,
+                colorscale=colorscale,
+                cmin=-0.5,
+                cmax=n_colors - 0.5,
+                showscale=False,
+            ),
+            text=df["NomEmpreendimento"],
+            customdata=df["electric_power_inst"],
+            hovertemplate="Name: %{text}<br>Elec. Power: %{customdata:.2f} kW"
+            "<br>Lat: %{lat:.4f}<br>Lon: %{lon:.4f}<extra></extra>",
+            name=category,
+            showlegend=False,
+        )
+    ]
+    for cat in categories:
+        traces.append(
+            go.Scattermapbox(
+                lat=[None],
+                lon=[None],
+                mode="markers",
+                marker=dict(size=5, color=color_dict[cat]),
+                name=cat,  # This will appear in the legend
+                hoverinfo="skip",
+            )
+        )
+    return traces
+
+
+def build_breakdown_text(cells: pd.DataFrame, breakdown: pd.DataFrame) -> pd.Series:
+    """
+    Build the hover labels of aggregated cells with vectorized string operations.
+
+    Args:
+        cells (pd.DataFrame): Cells with plant_count and electric_power_inst columns
+        breakdown (pd.DataFrame): Power of every cell by category
+
+    Returns:
+        pd.Series: Hover label of every cell, listing the categories with power
+    """
+    text = (
+        pd.Series(np.char.mod("%d", cells["plant_count"].to_numpy()))
+        .astype("string[pyarrow]")
+        .radd("Plants: ")
+        + "<br>Elec. Power [MW]: "
+        + np.char.mod("%.2f", cells["electric_power_inst"].to_numpy())
+    )
+    for cat in breakdown.columns:
+        cat_power = breakdown[cat].to_numpy()
+        text = text + np.where(
+            cat_power > 0,
+            np.char.add(f"<br>{cat}: ", np.char.mod("%.2f", cat_power)),
+            "",
+        )
+    return text
+
+
+def build_cluster_layer(
+    clusters: pd.DataFrame,
+    breakdown: pd.DataFrame,
+    categories: List[str],
+    color_dict: Dict[str, str],
+) -> List[go.Scattermapbox]:
+    """
+    Create the cluster layer of the power plants locations.
+
+    Every cluster is a marker with its area proportional to the installed power,
+    colored by its dominant category. The hover label lists the number of
+    plants, the power and its breakdown by category.
+
+    Args:
+        clusters (pd.DataFrame): Clusters from cluster_func.grid_clusters
+        breakdown (pd.DataFrame): Power of every cluster by category
+        categories (List[str]): Categories shown in the legend, in order
+        color_dict (Dict[str, str]): Dictionary mapping categories to colors
+
+    Returns:
+        List[go.Scattermapbox]: Cluster trace followed by the legend traces
+    """
+    power = clusters["electric_power_inst"].to_numpy()
+    max_power = power.max() if len(power) and power.max() > 0 else 1.0
+    sizes = 6 + 34 * np.sqrt(power / max_power)
+    text = build_breakdown_text(clusters, breakdown)
+
+    colors = [color_dict.get(cat, "#000000") for cat in clusters["dominant"]]
+    traces = [
+        go.Scattermapbox(
+            lat=clusters["latitude"],
+            lon=clusters["longitude"],
+            mode="markers",
+            marker=dict(size=sizes, color=colors, opacity=0.8),
+            text=text,
+            name="clusters",
+            hoverinfo="text",
+            showlegend=False,
+        )
+    ]
+    for cat in categories:
+        traces.append(
+            go.Scattermapbox(
+                lat=[None],
+                lon=[None],
+                mode="markers",
+                marker=dict(size=5, color=color_dict.get(cat, "#000000")),
+                name=cat,
+            )
+        )
+    return traces
+
+
+def use_clusters(n_points: int, zoom: float, clustering: str = "auto") -> bool:
+    """
+    Tell if a location map draws grid clusters instead of the plants.
+
+    Clusters bound the number of markers sent to the browser, raw points are
+    only drawn zoomed in past config.cluster_max_zoom or for at most
+    config.cluster_point_threshold plants, unless clustering forces one of them.
+
+    Args:
+        n_points (int): Number of plants of the map
+        zoom (float): Initial zoom level of the map
+        clustering (str): "auto", "clusters" or "points"
+
+    Returns:
+        bool: True to draw clusters
+    """
+    if clustering == "auto":
+        return (
+            zoom < config.cluster_max_zoom and n_points > config.cluster_point_threshold
+        )
+    return clustering == "clusters"
+
+
+# define location map for every generator
+def loc_map_plot(
+    df: pd.DataFrame,
+    geodf: "gpd.GeoDataFrame",
+    geojson: Any,
+    status: str,
+    category: str,
+    color_scale: str,
+    zoom: float = 2.5,
+    clustering: str = "auto",
+    levels: Optional[Dict[int, Any]] = None,
+) -> go.Figure:
+    """
+    Create the map with the location of the power plants of a status.
+
+    The plants are drawn as grid clusters sized by installed power, unless the
+    map is zoomed in past config.cluster_max_zoom, the status has at most
+    config.cluster_point_threshold plants or clustering is "points".
+
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        geodf (gpd.GeoDataFrame): GeoDataFrame with the states of Brazil
+        geojson (Any): State boundaries of geodf, GeoJSON dict or url
+        status (str): Status of the plants to display
+        category (str): Column used to color the plants
+        color_scale (str): Name of the Plotly qualitative color palette to use
+        zoom (float): Initial zoom level of the map
+        clustering (str): "auto", "clusters" or "points"
+        levels (Optional[Dict[int, Any]]): Clusters of the plants of the status by zoom level, computed if needed and not given
+
+    Returns:
+        go.Figure: Plotly figure
+    """
+
+    # # read data
+    # csv_file_path = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\transformed_data.pkl"
+    # df_aux = pd.read_pickle(csv_file_path)
+
+    # # read geojson data
+    # geojson_file_path_state = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\all_states.geojson"
+    # geojson_data_state = gpd.read_file(geojson_file_path_state)
+    df_aux = df
+    geojson_data_state = geodf
+
+    # define colors for graph
+    categories = df_aux[category].unique().tolist()
+    color_dict = generate_color_dict_plotly(categories=categories, colormap=color_scale)
+
+    # filter dataframe
+    df_filtered = df_aux[df_aux["status"] == status]
+
+    if use_clusters(len(df_filtered), zoom, clustering):
+        if levels is None:
+            levels = cluster_func.cluster_levels(df_filtered, category)
+        clusters, breakdown = levels[cluster_func.nearest_level(zoom, list(levels))]
+        layer = build_cluster_layer(clusters, breakdown, categories, color_dict)
+    else:
+        layer = build_point_layer(df_filtered, category, categories, color_dict)
+
+    # Calculate the center coordinates
+    center = {"lat": -11.61, "lon": -51.81}
+
+    import plotly.express as px
+
+    # Create the base map
+    fig = px.choropleth_mapbox(
+        geojson_data_state,
+        geojson=geojson,
+        locations="abbrev_state",
+        mapbox_style="carto-darkmatter",
+        zoom=zoom,
+        center=center,
+        opacity=0.2,
+    )
+    # delete the legend of the choropleth
+    fig.data[0].showlegend = False
+
+    # Add scatter plot for location points of power plants
+    fig.add_traces(layer)
+
+    # Update layout
+    # fig.update_layout(
+    #     title="Power Plants in Brazil",
+    #     legend_title="Power Plants",
+    #     # paper_bgcolor="#343a40",
+    #     # plot_bgcolor="#343a40",
+    #     # font_color="white",
+    # )
+
+    return optimize_figure(fig)
+
+
+def hex_density_map(
+    cells: pd.DataFrame, breakdown: pd.DataFrame, resolution: str, colors_scale: str
+) -> go.Figure:
+    """
+    Create a map of the installed power summed in the cells of a hexagonal grid.
+
+    Only the non-empty cells are sent to the browser, a few hundred polygons
+    instead of every plant.
+
+    Args:
+        cells (pd.DataFrame): Non-empty cells, see cluster_func.hex_density_cells
+        breakdown (pd.DataFrame): Power of every cell by category
+        resolution (str): Resolution of the grid, one of config.hex_resolutions
+        colors_scale (str): Color scale for the map
+
+    Returns:
+        go.Figure: Plotly figure
+    """
+    polygons = cluster_func.hex_polygons(
+        cells["q"].to_numpy(), cells["r"].to_numpy(), config.hex_resolutions[resolution]
+    )
+    ids = cells.index.astype(str).tolist()
+    rings = np.round(polygons, config.geometry_decimals)
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": cell_id,
+                "geometry": {"type": "Polygon", "coordinates": [ring.tolist()]},
+            }
+            for cell_id, ring in zip(ids, rings)
+        ],
+    }
+
+    power = cells["electric_power_inst"].to_numpy()
+    fig = go.Figure(
+        go.Choroplethmapbox(
+            geojson=geojson,
+            locations=ids,
+            z=power,
+            zmin=np.percentile(power, 5) if len(power) else None,
+            zmax=np.percentile(power, 95) if len(power) else None,
+            colorscale=colors_scale,
+            marker=dict(opacity=0.8, line=dict(width=0)),
+            text=build_breakdown_text(cells, breakdown),
+            hoverinfo="text",
+            colorbar=dict(title="Electric Power KW"),
+        )
+    )
+    fig.update_layout(
+        mapbox=dict(
+            style="carto-darkmatter", center={"lat": -11.61, "lon": -51.81}, zoom=2.3
+        ),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+    )
+    return optimize_figure(fig)
+
+
+# define bar plot of the net capacity change between two vintages
+def net_capacity_bar(net: pd.DataFrame, column: str) -> go.Figure:
+    """
+    Create a bar plot of the net change of installed power by a column.
+
+    Args:
+        net (pd.DataFrame): Old, new and net power by column value, see compare_func.net_capacity_totals
+        column (str): Column the power is broken down by
+
+    Returns:
+        go.Figure: Plotly figure, gains in green and losses in red
+    """
+    net_mw = net["net"].to_numpy() / 1000
+    fig = go.Figure(
+        go.Bar(
+            x=net[column].astype(str),
+            y=net_mw,
+            marker_color=np.where(net_mw < 0, "#d62728", "#2ca02c"),
+            customdata=np.column_stack([net["old"] / 1000, net["new"] / 1000]),
+            hovertemplate=f"{column}=%{{x}}<br>Net change (MW)=%{{y:,.2f}}"
+            "<br>Before (MW)=%{customdata[0]:,.2f}"
+            "<br>After (MW)=%{customdata[1]:,.2f}<extra></extra>",
+        )
+    )
+    fig.update_layout(xaxis_title=None, yaxis_title="Net change of Electric Power (MW)")
+    fig.update_xaxes(tickangle=45)
+    return optimize_figure(fig)
@@ -0,0 +1,91 @@
+# import libraries
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from core import index_func
+
+
+def filter_mask(
+    df: pd.DataFrame, filters: Optional[Dict[str, List[str]]] = None
+) -> np.ndarray:
+    """
+    Get the rows of a dataframe that match the selected filters as one combined mask.
+
+    Args:
+        df (pd.DataFrame): DataFrame to filter
+        filters (Optional[Dict[str, List[str]]]): Selected values by column, empty lists select everything
+
+    Returns:
+        np.ndarray: Boolean mask of the matching rows
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values:
+            mask &= df[column].isin(values).to_numpy()
+    return mask
+
+
+def apply_filters(
+    df: pd.DataFrame,
+    filters: Optional[Dict[str, List[str]]] = None,
+    index: Optional[index_func.BitmapIndex] = None,
+) -> pd.DataFrame:
+    """
+    Keep the rows of a dataframe that match the selected filters.
+
+    Args:
+        df (pd.DataFrame): DataFrame to filter
+        filters (Optional[Dict[str, List[str]]]): Selected values by column, empty lists select everything
+        index (Optional[index_func.BitmapIndex]): Bitmap index of df, the rows are selected with it if given
+
+    Returns:
+        pd.DataFrame: Filtered DataFrame, df itself without active filters
+    """
+    if not any((filters or {}).values()):
+        return df
+    if index is not None:
+        return index.take(df, filters)
+    return df[filter_mask(df, filters)]
+
+
+def group_power(df: pd.DataFrame, category: Union[str, List[str]]) -> pd.DataFrame:
+    """
+    Group the DataFrame by a category and sum the electric power.
+
+    Args:
+        df (pd.DataFrame): DataFrame to group
+        category (Union[str, List[str]]): Column(s) to group by
+
+    Returns:
+        pd.DataFrame: Grouped DataFrame
+    """
+    return (
+        df.groupby(category, observed=True)
+        .agg({"electric_power_inst": "sum"})
+        .reset_index()
+    )
+
+
+def filtered_options(
+    df: pd.DataFrame,
+    column: str,
+    filters: Dict[str, List[str]],
+    index: Optional[index_func.BitmapIndex] = None,
+) -> List[str]:
+    """
+    Get the values of a column left by the selections of the other filters.
+
+    Args:
+        df (pd.DataFrame): The original DataFrame
+        column (str): The name of the column for which we want to get filtered options
+        filters (Dict[str, List[str]]): A dictionary of current filter selections for other columns
+        index (Optional[index_func.BitmapIndex]): Bitmap index of df, the options are read from it if given
+
+    Returns:
+        List[str]: Sorted list of unique values from the specified column
+    """
+    if index is not None:
+        return sorted(index.options(column, filters))
+    return sorted(df.loc[filter_mask(df, filters), column].unique())
@@ -0,0 +1,231 @@
+# import libraries
+import argparse
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def geometry_path(level: str, data_dir: Optional[str] = None) -> str:
+    """
+    Get the path of the cached state geometries at a resolution level.
+
+    Args:
+        level (str): Resolution level, one of config.geometry_levels
+        data_dir (Optional[str]): Data directory, defaults to config.data_dir
+
+    Returns:
+        str: Path to the geojson file
+    """
+    return os.path.join(
+        data_dir or config.data_dir, "geometry", f"states_{level}.geojson"
+    )
+
+
+def simplify_states(geodf: gpd.GeoDataFrame, tolerance: float) -> gpd.GeoDataFrame:
+    """
+    Simplify the state polygons keeping the borders shared between states aligned.
+
+    Coverage simplification (shapely >= 2.1) simplifies every shared border once,
+    so neighbouring states never overlap or leave gaps between them. Older
+    shapely versions fall back to the topology-preserving simplification of
+    each polygon.
+
+    Args:
+        geodf (gpd.GeoDataFrame): GeoDataFrame with the states of Brazil
+        tolerance (float): Simplification tolerance in degrees, 0 keeps every vertex
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame with the simplified geometries
+    """
+    if not tolerance:
+        return geodf.copy()
+    if hasattr(shapely, "coverage_simplify"):
+        geometry = shapely.coverage_simplify(geodf.geometry.values._data, tolerance)
+    else:
+        geometry = geodf.geometry.simplify(tolerance, preserve_topology=True).values
+    return geodf.set_geometry(gpd.GeoSeries(geometry, index=geodf.index, crs=geodf.crs))
+
+
+def build_geometry_levels(
+    source: Optional[str] = None, data_dir: Optional[str] = None, force: bool = False
+) -> Dict[str, str]:
+    """
+    Build and cache on disk the state geometries at every resolution level.
+
+    The source is only read when some level is missing (or when force is True).
+
+    Args:
+        source (Optional[str]): GeoJSON file path or url, defaults to config.geojson_file_path_state
+        data_dir (Optional[str]): Data directory, defaults to config.data_dir
+        force (bool): Rebuild the levels that are already cached
+
+    Returns:
+        Dict[str, str]: Path of the geojson file of every level
+    """
+    paths = {level: geometry_path(level, data_dir) for level in config.geometry_levels}
+    missing = [
+        level for level, path in paths.items() if force or not os.path.exists(path)
+    ]
+    if not missing:
+        return paths
+
+    geodf = gpd.read_file(source or config.geojson_file_path_state)
+    for level in missing:
+        simplified = simplify_states(geodf, config.geometry_levels[level])
+        os.makedirs(os.path.dirname(paths[level]), exist_ok=True)
+        tmp_path = f"{paths[level]}.tmp"
+        simplified.to_file(tmp_path, driver="GeoJSON")
+        os.replace(tmp_path, paths[level])
+        logger.info(
+            "state geometries %s: %d vertices, %.1f kB",
+            level,
+            shapely.get_num_coordinates(simplified.geometry.values._data).sum(),
+            os.path.getsize(paths[level]) / 1e3,
+        )
+    return paths
+
+
+def quantize_geojson(geodf: gpd.GeoDataFrame, decimals: int = None) -> Dict[str, Any]:
+    """
+    Convert the state geometries to a compact GeoJSON with rounded coordinates.
+
+    Only the state abbreviation is kept, as the feature id and as the
+    abbrev_state property used by the maps to match the data with the states.
+    With 3 decimals the coordinates are precise to about 100 m.
+
+    Args:
+        geodf (gpd.GeoDataFrame): GeoDataFrame with the states of Brazil
+        decimals (int): Decimals of the coordinates, defaults to config.geometry_decimals
+
+    Returns:
+        Dict[str, Any]: GeoJSON FeatureCollection
+    """
+    decimals = config.geometry_decimals if decimals is None else decimals
+    geometry = shapely.transform(
+        geodf.geometry.values._data, lambda coords: np.round(coords, decimals)
+    )
+    features = [
+        {
+            "type": "Feature",
+            "id": state,
+            "properties": {"abbrev_state": state},
+            "geometry": shapely.geometry.mapping(geom),
+        }
+        for state, geom in zip(geodf["abbrev_state"], geometry)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def geometry_digest(path: str) -> str:
+    """Get a digest of a cached geometry file and the decimals of its payload"""
+    digest = hashlib.sha1(f"{config.geometry_decimals}:".encode())
+    with open(path, "rb") as file:
+        digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def payload_name(level: str, digest: str) -> str:
+    """Get the file name of the geometry payload of a level and geometry digest"""
+    return f"states_{level}_{digest}.json"
+
+
+def payload_path(level: str, digest: str) -> str:
+    """Get the path of the geometry payload, served at geometry_url(level, digest)"""
+    return os.path.join(config.static_dir, payload_name(level, digest))
+
+
+def geometry_url(level: str, digest: str) -> str:
+    """Get the url of the geometry payload of a level and geometry digest, relative to the app"""
+    return f"app/static/{payload_name(level, digest)}"
+
+
+def write_geometry_payload(
+    geodf: gpd.GeoDataFrame, level: str, digest: str
+) -> Dict[str, Any]:
+    """
+    Write the quantized geometries of a level where streamlit serves static files.
+
+    Every map references the payload by url, so the browser downloads it once
+    instead of once per figure. The file name carries the digest of the
+    geometries, so different geometries never overwrite each other's payload.
+
+    Args:
+        geodf (gpd.GeoDataFrame): GeoDataFrame with the states of Brazil
+        level (str): Resolution level of the geometries
+        digest (str): Digest of the geometry file, see geometry_digest
+
+    Returns:
+        Dict[str, Any]: The quantized GeoJSON
+    """
+    payload = quantize_geojson(geodf)
+    text = json.dumps(payload, separators=(",", ":"))
+    path = payload_path(level, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+    logger.info(
+        "geometry payload %s: %.1f kB (%.1f kB at full precision)",
+        level,
+        len(text) / 1e3,
+        len(geodf.to_json()) / 1e3,
+    )
+    return payload
+
+
+def read_geometry(level: str, data_dir: Optional[str] = None) -> gpd.GeoDataFrame:
+    """
+    Read the state geometries at a resolution level, building the cache if needed.
+
+    The geometries of the app data directory (config.data_dir) are also written
+    to the static files served by the app and referenced by their url; those of
+    other data directories are only embedded in the figures.
+
+    Args:
+        level (str): Resolution level, one of config.geometry_levels
+        data_dir (Optional[str]): Data directory, defaults to config.data_dir
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame with the states of Brazil
+    """
+    if level not in config.geometry_levels:
+        raise ValueError(
+            f"Unknown geometry level '{level}', use one of {list(config.geometry_levels)}"
+        )
+    path = build_geometry_levels(data_dir=data_dir)[level]
+    geodf = gpd.read_file(path)
+    digest = geometry_digest(path)
+    # identifies these geometries in the keys of cached figures
+    geodf.attrs["geometry_token"] = f"{level}:{digest}"
+    if os.path.abspath(data_dir or config.data_dir) == os.path.abspath(config.data_dir):
+        if not os.path.exists(payload_path(level, digest)):
+            write_geometry_payload(geodf, level, digest)
+        geodf.attrs["geometry_url"] = geometry_url(level, digest)
+    return geodf
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the simplified state geometries at every resolution level."
+    )
+    parser.add_argument("--source", help="geojson file path or url of the states")
+    parser.add_argument("--data-dir", help="directory where the geometries are stored")
+    parser.add_argument("--force", action="store_true", help="rebuild every level")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for level, path in build_geometry_levels(
+        source=args.source, data_dir=args.data_dir, force=args.force
+    ).items():
+        geodf = read_geometry(level, args.data_dir)
+        print(level, path, geodf.attrs.get("geometry_url", "(not served)"))
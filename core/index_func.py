@@ -0,0 +1,126 @@
+# import libraries
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class BitmapIndex:
+    """
+    Bitmap index of the rows of a dataframe by the values of its filter columns.
+
+    For every column and value the rows holding that value are kept as a packed
+    bit array (one bit per row). A combination of filters is resolved with
+    bitwise OR inside a column and AND across columns, without building any
+    intermediate dataframe.
+
+    Attributes
+    ----------
+    n_rows : int
+        Number of rows of the indexed dataframe.
+    bitmaps : dict
+        Packed bit arrays by column and value.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        """
+        Build the index of a dataframe.
+
+        Args:
+            df (pd.DataFrame): DataFrame to index, must not change afterwards
+            columns (List[str]): Columns to index
+        """
+        self.n_rows = len(df)
+        self.bitmaps: Dict[str, Dict[Any, np.ndarray]] = {}
+        for column in columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes = values.cat.codes.to_numpy()
+                categories = values.cat.categories
+            else:
+                codes, categories = pd.factorize(values)
+            self.bitmaps[column] = {
+                category: np.packbits(codes == code)
+                for code, category in enumerate(categories)
+            }
+
+    def _column_bitmap(self, column: str, values: List[Any]) -> np.ndarray:
+        """Packed bit array of the rows holding any of the values of a column"""
+        bitmap = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        column_bitmaps = self.bitmaps[column]
+        for value in values:
+            if value in column_bitmaps:
+                bitmap |= column_bitmaps[value]
+        return bitmap
+
+    def bitmap(self, filters: Dict[str, List[Any]]) -> Optional[np.ndarray]:
+        """
+        Resolve a combination of filters to a packed bit array.
+
+        Args:
+            filters (Dict[str, List[Any]]): Selected values by column, empty lists select everything
+
+        Returns:
+            Optional[np.ndarray]: Packed bit array of the selected rows, None if no filter is active
+        """
+        result = None
+        for column, values in filters.items():
+            if not values:
+                continue
+            column_bitmap = self._column_bitmap(column, values)
+            if result is None:
+                result = column_bitmap
+            else:
+                result &= column_bitmap
+        return result
+
+    def select(self, filters: Dict[str, List[Any]]) -> np.ndarray:
+        """
+        Get the positions of the rows that match a combination of filters.
+
+        Args:
+            filters (Dict[str, List[Any]]): Selected values by column, empty lists select everything
+
+        Returns:
+            np.ndarray: Sorted row positions
+        """
+        bitmap = self.bitmap(filters)
+        if bitmap is None:
+            return np.arange(self.n_rows)
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows))
+
+    def take(self, df: pd.DataFrame, filters: Dict[str, List[Any]]) -> pd.DataFrame:
+        """
+        Filter the indexed dataframe with a single take of the selected rows.
+
+        Args:
+            df (pd.DataFrame): The dataframe the index was built from
+            filters (Dict[str, List[Any]]): Selected values by column, empty lists select everything
+
+        Returns:
+            pd.DataFrame: Filtered DataFrame
+        """
+        if not any(filters.values()):
+            return df
+        return df.iloc[self.select(filters)]
+
+    def options(self, column: str, filters: Dict[str, List[Any]]) -> List[Any]:
+        """
+        Get the values of a column present in the rows that match the filters.
+
+        Args:
+            column (str): Column to get the values of, must be indexed
+            filters (Dict[str, List[Any]]): Selected values by column
+
+        Returns:
+            List[Any]: Values of the column, in index order
+        """
+        bitmap = self.bitmap(filters)
+        column_bitmaps = self.bitmaps[column]
+        if bitmap is None:
+            return [value for value, bits in column_bitmaps.items() if bits.any()]
+        return [
+            value
+            for value, bits in column_bitmaps.items()
+            if np.bitwise_and(bits, bitmap).any()
+        ]
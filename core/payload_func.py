@@ -0,0 +1,135 @@
+# import libraries
+import base64
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# attributes holding coordinates in degrees, rounded before they are encoded
+COORDINATE_KEYS = {"lat", "lon"}
+# plotly.js typed array dtypes by numpy dtype, integers use the smallest that fits
+INTEGER_DTYPES = [
+    (np.uint8, "u1"),
+    (np.int8, "i1"),
+    (np.uint16, "u2"),
+    (np.int16, "i2"),
+    (np.uint32, "u4"),
+    (np.int32, "i4"),
+]
+
+
+def typed_array(values: np.ndarray) -> Optional[Dict[str, str]]:
+    """
+    Encode a numeric array as a plotly.js typed array spec.
+
+    Floats are sent as float32 and integers in the smallest integer type that
+    holds them. The spec is a dict with the dtype and the base64 encoded bytes,
+    decoded by plotly.js (2.28 and later) where plain number lists are accepted.
+
+    Args:
+        values (np.ndarray): Numeric array
+
+    Returns:
+        Optional[Dict[str, str]]: Typed array spec, None for non-numeric arrays or integers beyond 32 bits
+    """
+    if values.dtype.kind == "f":
+        encoded, dtype = values.astype("<f4"), "f4"
+    elif values.dtype.kind in "iu":
+        low, high = (values.min(), values.max()) if len(values) else (0, 0)
+        for numpy_dtype, dtype in INTEGER_DTYPES:
+            info = np.iinfo(numpy_dtype)
+            if info.min <= low and high <= info.max:
+                encoded = values.astype(np.dtype(numpy_dtype).newbyteorder("<"))
+                break
+        else:
+            return None
+    else:
+        return None
+    return {
+        "dtype": dtype,
+        "bdata": base64.b64encode(np.ascontiguousarray(encoded).tobytes()).decode(),
+    }
+
+
+def _encode_arrays(props: Dict[str, Any], decimals: int, min_length: int) -> None:
+    """Replace in place the numeric arrays of trace properties by typed array specs"""
+    for key, value in props.items():
+        if isinstance(value, dict):
+            _encode_arrays(value, decimals, min_length)
+            continue
+        if not isinstance(value, np.ndarray) or value.ndim != 1:
+            continue
+        if len(value) < min_length or value.dtype.kind not in "fiu":
+            continue
+        if key in COORDINATE_KEYS:
+            value = np.round(value.astype(np.float64), decimals)
+        spec = typed_array(value)
+        if spec is not None:
+            props[key] = spec
+
+
+def payload_size(fig: go.Figure) -> int:
+    """Get the size in bytes of a figure serialized the way streamlit sends it"""
+    return len(pio.to_json(fig, validate=False))
+
+
+def optimize_figure(
+    fig: go.Figure, decimals: int = None, min_length: int = None
+) -> go.Figure:
+    """
+    Shrink the payload of a figure by sending its numeric arrays as typed arrays.
+
+    Coordinates are rounded to config.figure_coordinate_decimals and every
+    numeric array of the traces (coordinates, values, marker sizes and color
+    codes) is base64 encoded as float32 or a small integer type, instead of
+    serialized as a list of decimal numbers. plotly.py does not validate typed
+    array specs, so the figure is rebuilt without validation: it is final,
+    callers must not read its arrays back.
+
+    The size before and after is logged at debug level, it costs a second
+    serialization of the figure.
+
+    Args:
+        fig (go.Figure): Validated figure
+        decimals (int): Decimals kept in latitudes and longitudes, defaults to config.figure_coordinate_decimals
+        min_length (int): Shorter arrays are left as lists, defaults to config.typed_array_min_length
+
+    Returns:
+        go.Figure: Figure with the same traces and layout, or fig itself if typed arrays are disabled
+    """
+    if not config.typed_arrays:
+        return fig
+    decimals = config.figure_coordinate_decimals if decimals is None else decimals
+    min_length = config.typed_array_min_length if min_length is None else min_length
+
+    spec = fig.to_dict()
+    for trace in spec["data"]:
+        _encode_arrays(trace, decimals, min_length)
+    optimized = load_figure(spec)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "figure payload %.1f kB, %.1f kB with typed arrays",
+            payload_size(fig) / 1e3,
+            payload_size(optimized) / 1e3,
+        )
+    return optimized
+
+
+def load_figure(spec: Dict[str, Any]) -> go.Figure:
+    """
+    Rebuild a figure serialized by optimize_figure, e.g. read back from json.
+
+    Args:
+        spec (Dict[str, Any]): Figure dict with data and layout, may hold typed array specs
+
+    Returns:
+        go.Figure: Figure, built without validation like optimize_figure
+    """
+    return go.Figure(spec, _validate=False)
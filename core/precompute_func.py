@@ -0,0 +1,402 @@
+# import libraries
+import argparse
+import logging
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import plotly.io as pio
+
+import config
+from core import cluster_func, cube_func, figure_func
+from core import storage_func as storage
+
+logger = logging.getLogger(__name__)
+
+# color scales of the precomputed figures, the same ones the pages use
+figure_color_scales = {
+    "choropleth": "cividis",
+    "bar": "Safe",
+    "pie": "Safe",
+    "history": "Plotly",
+    "locations": "Plotly",
+    "hex": "cividis",
+}
+
+
+def slug(value: Any) -> str:
+    """Get a file name safe form of a status or category value, "all" for None"""
+    if value is None:
+        return "all"
+    text = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore")
+    return re.sub(r"[^a-z0-9]+", "_", text.decode().lower()).strip("_") or "_"
+
+
+def precompute_dir(version: str, data_dir: Optional[str] = None) -> str:
+    """Get the directory of the precomputed aggregates and figures of a dataset version"""
+    return os.path.join(data_dir or config.data_dir, "precomputed", version)
+
+
+class Precomputer:
+    """
+    Writer of the aggregates and figures of a dataset version to a directory.
+
+    Every output is listed in the index with its kind and parameters, readers
+    look files up there instead of rebuilding their names.
+
+    Attributes
+    ----------
+    out_dir : str
+        Output directory.
+    index : list
+        Kind, parameters, relative path and build time of every output.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.index: List[Dict[str, Any]] = []
+
+    def _write(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        path: str,
+        build: Callable[[], Any],
+        write: Callable[[Any, str], Any],
+    ) -> None:
+        """Build an output, write it and add it to the index"""
+        start = time.perf_counter()
+        write(build(), os.path.join(self.out_dir, path))
+        self.index.append(
+            {
+                "kind": kind,
+                "params": params,
+                "path": path,
+                "seconds": round(time.perf_counter() - start, 4),
+            }
+        )
+
+    def frame(self, kind: str, params: Dict[str, Any], path: str, build) -> None:
+        """Write an aggregate as an arrow ipc file"""
+        self._write(kind, params, path + ".arrow", build, storage.write_snapshot)
+
+    def figure(self, kind: str, params: Dict[str, Any], path: str, build) -> None:
+        """Write a figure as the json that streamlit sends to the browser"""
+        self._write(kind, params, path + ".json", build, write_figure)
+
+
+def write_figure(fig: Any, path: str) -> str:
+    """Write a figure as json atomically, the same way as storage_func.write_json"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(pio.to_json(fig, validate=False))
+    os.replace(tmp_path, path)
+    return path
+
+
+def history_frame(history) -> pd.DataFrame:
+    """Get the cumulative power of figure_func.historic_power as a frame, one column per category"""
+    categories, years, matrix = history
+    frame = pd.DataFrame(matrix, columns=[str(cat) for cat in categories])
+    frame.insert(0, "year", years)
+    return frame
+
+
+def precompute_aggregates(
+    writer: Precomputer,
+    df: pd.DataFrame,
+    cube: pd.DataFrame,
+    statuses: List[Optional[str]],
+    categories: List[str],
+    map_categories: List[str],
+) -> None:
+    """
+    Write the aggregates of a dataset for every status and category.
+
+    Args:
+        writer (Precomputer): Writer of the outputs
+        df (pd.DataFrame): Dataset
+        cube (pd.DataFrame): Aggregation cube of the dataset, see cube_func.build_cube
+        statuses (List[Optional[str]]): Statuses, None for every status
+        categories (List[str]): Group-by columns of the tables and bar and pie charts
+        map_categories (List[str]): Category columns of the maps and the history
+    """
+    writer.frame("cube", {}, "aggregates/cube", lambda: cube)
+    writer.frame(
+        "status_totals",
+        {},
+        "aggregates/status_totals",
+        lambda: cube_func.status_totals(cube).reset_index(),
+    )
+
+    for status in statuses:
+        filters = {"status": [status]} if status else None
+        for category in categories:
+            writer.frame(
+                "rollup",
+                {"status": status, "category": category},
+                f"aggregates/rollup/{slug(status)}/{category}",
+                lambda: cube_func.rollup(cube, category, filters),
+            )
+        if status is None:
+            continue
+        writer.frame(
+            "states",
+            {"status": status},
+            f"aggregates/states/{slug(status)}",
+            lambda: cube_func.rollup(
+                cube, "states", filters, ["electric_power_inst", "electric_power_decl"]
+            ),
+        )
+        plants = df[df["status"] == status]
+        for category in map_categories:
+            for zoom, (clusters, breakdown) in cluster_func.cluster_levels(
+                plants, category
+            ).items():
+                writer.frame(
+                    "clusters",
+                    {"status": status, "category": category, "zoom": zoom},
+                    f"aggregates/clusters/{slug(status)}/{category}/{zoom}",
+                    lambda: clusters.join(breakdown.add_prefix("power:")),
+                )
+
+    for category in map_categories:
+        writer.frame(
+            "history",
+            {"category": category},
+            f"aggregates/history/{category}",
+            lambda: history_frame(figure_func.historic_power(df, category)),
+        )
+
+
+def precompute_figures(
+    writer: Precomputer,
+    df: pd.DataFrame,
+    cube: pd.DataFrame,
+    geometries: Dict[str, Any],
+    geojson: Dict[str, Any],
+    statuses: List[Optional[str]],
+    categories: List[str],
+    map_categories: List[str],
+    distinct_values: Dict[str, List[Any]],
+) -> None:
+    """
+    Write the figures of a dataset for every status and category.
+
+    Args:
+        writer (Precomputer): Writer of the outputs
+        df (pd.DataFrame): Dataset
+        cube (pd.DataFrame): Aggregation cube of the dataset, see cube_func.build_cube
+        geometries (Dict[str, Any]): State geometries by map, see config.map_geometry_levels
+        geojson (Dict[str, Any]): State boundaries referenced by the figures, by map
+        statuses (List[Optional[str]]): Statuses, None for every status
+        categories (List[str]): Group-by columns of the bar and pie charts
+        map_categories (List[str]): Category columns of the maps and the history
+        distinct_values (Dict[str, List[Any]]): Distinct values of the category columns, for the colors
+    """
+    scales = figure_color_scales
+    grids = {
+        resolution: cluster_func.hex_grid(df, size)
+        for resolution, size in config.hex_resolutions.items()
+    }
+
+    for status in statuses:
+        filters = {"status": [status]} if status else None
+        for category in categories:
+            grouped = cube_func.rollup(cube, category, filters)
+            color_dict = figure_func.generate_color_dict_plotly(
+                distinct_values[category], scales["bar"]
+            )
+            params = {"status": status, "category": category}
+            for kind, build in [
+                ("bar", figure_func.bar_plot_status_category),
+                ("pie", figure_func.pie_plot_status_category),
+            ]:
+                writer.figure(
+                    kind,
+                    params,
+                    f"figures/{kind}/{slug(status)}/{category}",
+                    lambda: build(grouped, category, color_dict),
+                )
+        if status is None:
+            continue
+
+        writer.figure(
+            "choropleth",
+            {"status": status},
+            f"figures/choropleth/{slug(status)}",
+            lambda: figure_func.choropleth_mapbox_ele_pow(
+                df, geojson["choropleth"], status, scales["choropleth"]
+            ),
+        )
+        for category in map_categories:
+            params = {"status": status, "category": category}
+            writer.figure(
+                "locations",
+                params,
+                f"figures/locations/{slug(status)}/{category}",
+                lambda: figure_func.loc_map_plot(
+                    df,
+                    geometries["locations"],
+                    geojson["locations"],
+                    status,
+                    category,
+                    scales["locations"],
+                ),
+            )
+            for resolution, (codes, cells) in grids.items():
+                writer.figure(
+                    "hex",
+                    {**params, "resolution": resolution},
+                    f"figures/hex/{resolution}/{slug(status)}/{category}",
+                    lambda: figure_func.hex_density_map(
+                        *cluster_func.hex_density_cells(
+                            df, codes, cells, status, category
+                        ),
+                        resolution,
+                        scales["hex"],
+                    ),
+                )
+
+    for category in map_categories:
+        writer.figure(
+            "history",
+            {"category": category},
+            f"figures/history/{category}",
+            lambda: figure_func.hist_line_plot(
+                figure_func.historic_power(df, category), category, scales["history"]
+            ),
+        )
+
+
+def read_geometries(
+    data_dir: Optional[str] = None, embed_geometry: bool = False
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Read the state geometries of every map and the boundaries their figures reference.
+
+    Args:
+        data_dir (Optional[str]): Data directory, defaults to config.data_dir
+        embed_geometry (bool): Reference the quantized GeoJSON instead of the url served by the app,
+            always embedded for data directories other than the app's
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: Geometries and GeoJSON dict or url, by map
+    """
+    from core import geo_func
+
+    geometries = {
+        name: geo_func.read_geometry(level, data_dir)
+        for name, level in config.map_geometry_levels.items()
+    }
+    geojson = {
+        name: (
+            geo_func.quantize_geojson(geodf)
+            if embed_geometry or "geometry_url" not in geodf.attrs
+            else geodf.attrs["geometry_url"]
+        )
+        for name, geodf in geometries.items()
+    }
+    return geometries, geojson
+
+
+def precompute(
+    version: Optional[str] = None,
+    data_dir: Optional[str] = None,
+    out_dir: Optional[str] = None,
+    figures: bool = True,
+    embed_geometry: bool = False,
+) -> str:
+    """
+    Precompute every aggregate and figure of a dataset version for every status and category.
+
+    The index.json of the output directory lists the outputs with their kind
+    and parameters, the dataset version and the total build time.
+
+    Args:
+        version (Optional[str]): Dataset version, defaults to the current one
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+        out_dir (Optional[str]): Output directory, defaults to precompute_dir of the version
+        figures (bool): Also build the figures, not only the aggregates
+        embed_geometry (bool): Embed the state boundaries in the figures instead of referencing the url served by the app
+
+    Returns:
+        str: Output directory
+    """
+    start = time.perf_counter()
+    version = version or storage.current_version(data_dir)
+    if version is None:
+        raise FileNotFoundError("No dataset version has been published yet")
+    out_dir = out_dir or precompute_dir(version, data_dir)
+    df = storage.load_dataset(version, data_dir)
+    distinct_values = storage.read_manifest(version, data_dir)["distinct_values"]
+
+    statuses = [None] + list(distinct_values["status"])
+    categories = config.groupby_column_names
+    map_categories = config.map_category_column_names
+
+    cube = cube_func.build_cube(df)
+    writer = Precomputer(out_dir)
+    precompute_aggregates(writer, df, cube, statuses, categories, map_categories)
+    if figures:
+        geometries, geojson = read_geometries(data_dir, embed_geometry)
+        precompute_figures(
+            writer,
+            df,
+            cube,
+            geometries,
+            geojson,
+            statuses,
+            categories,
+            map_categories,
+            distinct_values,
+        )
+
+    storage.write_json(
+        {
+            "version": version,
+            "seconds": round(time.perf_counter() - start, 3),
+            "outputs": writer.index,
+        },
+        os.path.join(out_dir, "index.json"),
+    )
+    logger.info(
+        "precomputed %d outputs of version %s in %.1f s to %s",
+        len(writer.index),
+        version,
+        time.perf_counter() - start,
+        out_dir,
+    )
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute the aggregates and figures of a dataset version."
+    )
+    parser.add_argument("--version", help="dataset version, the current one by default")
+    parser.add_argument("--data-dir", help="directory where the snapshots are stored")
+    parser.add_argument("--out-dir", help="output directory")
+    parser.add_argument(
+        "--aggregates-only", action="store_true", help="do not build the figures"
+    )
+    parser.add_argument(
+        "--embed-geometry",
+        action="store_true",
+        help="embed the state boundaries in the figures instead of their url",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(
+        precompute(
+            version=args.version,
+            data_dir=args.data_dir,
+            out_dir=args.out_dir,
+            figures=not args.aggregates_only,
+            embed_geometry=args.embed_geometry,
+        )
+    )
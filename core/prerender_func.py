@@ -0,0 +1,224 @@
+# import libraries
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+import config
+from core import cube_func, figure_func
+from core import storage_func as storage
+from core.payload_func import load_figure
+from core.precompute_func import read_geometries
+
+logger = logging.getLogger(__name__)
+
+# pages with a prerendered default view
+pages = ["main_page", "electric_matrix", "hist_evol", "geo_distr"]
+
+
+def prerender_path(page: str, version: str, data_dir: Optional[str] = None) -> str:
+    """Get the path of the prerendered default view of a page for a dataset version"""
+    return os.path.join(
+        data_dir or config.data_dir, "prerendered", version, f"{page}.json"
+    )
+
+
+def default_params(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the parameters of the default view of the pages, the first option of every selector.
+
+    Args:
+        manifest (Dict[str, Any]): Manifest of the dataset version, see storage_func.build_manifest
+
+    Returns:
+        Dict[str, Any]: Status, map category, group-by columns and graph column
+    """
+    return {
+        "status": manifest["distinct_values"]["status"][0],
+        "category": config.map_category_column_names[0],
+        "groupby_columns": config.groupby_column_names,
+        "graph_column": config.groupby_column_names[0],
+    }
+
+
+def render_views(
+    df: pd.DataFrame,
+    manifest: Dict[str, Any],
+    geometries: Dict[str, Any],
+    geojson: Dict[str, Any],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Build the figures and KPIs of the default view of every page.
+
+    The figures are built with the same parameters as the pages use before the
+    visitor changes any selector, so the live render replaces them seamlessly.
+
+    Args:
+        df (pd.DataFrame): Dataset
+        manifest (Dict[str, Any]): Manifest of the dataset version
+        geometries (Dict[str, Any]): State geometries by map, see config.map_geometry_levels
+        geojson (Dict[str, Any]): State boundaries referenced by the figures, by map
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Parameters, figures and KPIs of every page
+    """
+    params = default_params(manifest)
+    status, category = params["status"], params["category"]
+    graph_column = params["graph_column"]
+
+    grouped = cube_func.rollup(cube_func.build_cube(df), params["groupby_columns"])
+    color_dict = figure_func.generate_color_dict_plotly(
+        manifest["distinct_values"][graph_column], "Safe"
+    )
+    power_by_status = {
+        value: totals["electric_power_inst"]
+        for value, totals in manifest["status"].items()
+    }
+
+    def loc_map(color_scale: str):
+        return figure_func.loc_map_plot(
+            df,
+            geometries["locations"],
+            geojson["locations"],
+            status,
+            category,
+            color_scale,
+        )
+
+    return {
+        "main_page": {
+            "figures": {"loc_map": loc_map("Pastel")},
+            "kpis": power_by_status,
+        },
+        "electric_matrix": {
+            "figures": {
+                "pie": figure_func.pie_plot_status_category(
+                    grouped, graph_column, color_dict
+                ),
+                "bar": figure_func.bar_plot_status_category(
+                    grouped, graph_column, color_dict
+                ),
+            },
+        },
+        "hist_evol": {
+            "figures": {
+                "hist_line": figure_func.hist_line_plot(
+                    figure_func.historic_power(df, category), category, "Plotly"
+                )
+            },
+        },
+        "geo_distr": {
+            "figures": {
+                "choropleth": figure_func.choropleth_mapbox_ele_pow(
+                    df, geojson["choropleth"], status, "cividis"
+                ),
+                "loc_map": loc_map("Plotly"),
+            },
+        },
+    }
+
+
+def prerender(
+    version: Optional[str] = None,
+    data_dir: Optional[str] = None,
+    embed_geometry: bool = False,
+) -> Dict[str, str]:
+    """
+    Write the default view of every page of a dataset version to disk.
+
+    Args:
+        version (Optional[str]): Dataset version, defaults to the current one
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+        embed_geometry (bool): Embed the state boundaries in the figures instead of referencing the url served by the app
+
+    Returns:
+        Dict[str, str]: Path of the view of every page
+    """
+    start = time.perf_counter()
+    version = version or storage.current_version(data_dir)
+    if version is None:
+        raise FileNotFoundError("No dataset version has been published yet")
+    df = storage.load_dataset(version, data_dir)
+    manifest = storage.read_manifest(version, data_dir)
+    geometries, geojson = read_geometries(data_dir, embed_geometry)
+
+    paths = {}
+    params = default_params(manifest)
+    for page, view in render_views(df, manifest, geometries, geojson).items():
+        view = {
+            "version": version,
+            "params": params,
+            "geometry": (
+                "url"
+                if any(isinstance(value, str) for value in geojson.values())
+                else "embedded"
+            ),
+            **view,
+            "figures": {name: fig.to_dict() for name, fig in view["figures"].items()},
+        }
+        path = prerender_path(page, version, data_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(to_json_plotly(view))
+        os.replace(tmp_path, path)
+        paths[page] = path
+
+    logger.info(
+        "prerendered %d pages of version %s in %.1f s",
+        len(paths),
+        version,
+        time.perf_counter() - start,
+    )
+    return paths
+
+
+def read_prerendered(
+    page: str, version: str, data_dir: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Read the prerendered default view of a page.
+
+    Args:
+        page (str): Page, one of pages
+        version (str): Dataset version
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        Optional[Dict[str, Any]]: View with its figures rebuilt, None if it was not prerendered
+    """
+    try:
+        with open(prerender_path(page, version, data_dir), encoding="utf-8") as file:
+            view = json.load(file)
+    except FileNotFoundError:
+        return None
+    view["figures"] = {
+        name: load_figure(spec) for name, spec in view["figures"].items()
+    }
+    return view
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prerender the default view of every page for a dataset version."
+    )
+    parser.add_argument("--version", help="dataset version, the current one by default")
+    parser.add_argument("--data-dir", help="directory where the snapshots are stored")
+    parser.add_argument(
+        "--embed-geometry",
+        action="store_true",
+        help="embed the state boundaries in the figures instead of their url",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for page, path in prerender(
+        version=args.version,
+        data_dir=args.data_dir,
+        embed_geometry=args.embed_geometry,
+    ).items():
+        print(page, path)
@@ -0,0 +1,273 @@
+# import libraries
+import argparse
+import copy
+import logging
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+from core import storage_func as storage
+
+logger = logging.getLogger(__name__)
+
+# readers for the file formats accepted in the drop directory
+vintage_readers = {
+    ".pkl": pd.read_pickle,
+    ".pickle": pd.read_pickle,
+    ".parquet": pd.read_parquet,
+    ".arrow": pd.read_feather,
+    ".feather": pd.read_feather,
+    ".csv": lambda path: pd.read_csv(path, parse_dates=["DatEntradaOperacao"]),
+}
+
+
+def key_index(df: pd.DataFrame, key_columns: List[str]) -> pd.DataFrame:
+    """
+    Index a dataset by plant key.
+
+    Plants with the same key get an occurrence number, so repeated keys are
+    matched in order of appearance instead of being dropped. Missing key values
+    form their own group, so every occurrence number is an integer.
+
+    Args:
+        df (pd.DataFrame): Dataset to index
+        key_columns (List[str]): Columns that identify a plant
+
+    Returns:
+        pd.DataFrame: Dataset indexed by the key columns plus the occurrence number
+    """
+    occurrence = df.groupby(
+        key_columns, observed=True, sort=False, dropna=False
+    ).cumcount()
+    return df.assign(_occurrence=occurrence.to_numpy()).set_index(
+        key_columns + ["_occurrence"]
+    )
+
+
+def _not_equal(old: pd.Series, new: pd.Series) -> np.ndarray:
+    """Vectorized inequality of two aligned columns, with missing values equal"""
+    if isinstance(old.dtype, pd.CategoricalDtype) or isinstance(
+        new.dtype, pd.CategoricalDtype
+    ):
+        old, new = old.astype(object), new.astype(object)
+    old_values, new_values = old.to_numpy(), new.to_numpy()
+    both_missing = pd.isna(old_values) & pd.isna(new_values)
+    return ~((old_values == new_values) | both_missing)
+
+
+def diff_snapshots(
+    old: pd.DataFrame, new: pd.DataFrame, key_columns: List[str]
+) -> Dict[str, Any]:
+    """
+    Compare two vintages of the dataset by plant key.
+
+    Args:
+        old (pd.DataFrame): Current dataset
+        new (pd.DataFrame): New vintage of the dataset
+        key_columns (List[str]): Columns that identify a plant
+
+    Returns:
+        Dict[str, Any]: Added and removed rows, old and new values of the changed
+        rows and the number of changes by column
+    """
+    old_keyed = key_index(old, key_columns)
+    new_keyed = key_index(new, key_columns)
+
+    added = new_keyed.index.difference(old_keyed.index, sort=False)
+    removed = old_keyed.index.difference(new_keyed.index, sort=False)
+    common = new_keyed.index.intersection(old_keyed.index, sort=False)
+
+    compare_columns = [c for c in new_keyed.columns if c in old_keyed.columns]
+    old_common = old_keyed.loc[common, compare_columns]
+    new_common = new_keyed.loc[common, compare_columns]
+    changes = pd.DataFrame(
+        {
+            column: _not_equal(old_common[column], new_common[column])
+            for column in compare_columns
+        },
+        index=common,
+    )
+    changed = changes.any(axis=1).to_numpy()
+
+    return {
+        "added": new_keyed.loc[added],
+        "removed": old_keyed.loc[removed],
+        "changed_old": old_common[changed],
+        "changed_new": new_common[changed],
+        "changed_columns": {
+            column: int(count) for column, count in changes.sum().items() if count
+        },
+    }
+
+
+def build_changelog(
+    diff: Dict[str, Any],
+    old: pd.DataFrame,
+    new: pd.DataFrame,
+    version: str,
+    parent: Dict[str, Any],
+    source: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build the changelog of a new version from its diff against the parent version.
+
+    The lineage of the parent is carried over and only the partitions (values of
+    the filter columns) with added, removed or changed rows move to the new
+    version, see storage_func.partition_token. The same goes for the columns
+    whose distinct values changed, see storage_func.values_token.
+
+    Args:
+        diff (Dict[str, Any]): Result of diff_snapshots
+        old (pd.DataFrame): Dataset of the parent version
+        new (pd.DataFrame): New vintage of the dataset
+        version (str): Version of the new vintage
+        parent (Dict[str, Any]): Changelog of the parent version
+        source (Optional[str]): Where the new vintage was read from
+
+    Returns:
+        Dict[str, Any]: Changelog of the new version
+    """
+    lineage = copy.deepcopy(parent["lineage"])
+    touched_rows = [
+        diff["added"],
+        diff["removed"],
+        diff["changed_old"],
+        diff["changed_new"],
+    ]
+    for column in config.dynamic_filter_column_names:
+        partitions = lineage["partitions"].setdefault(column, {})
+        for rows in touched_rows:
+            if column in rows.index.names:
+                values = rows.index.get_level_values(column)
+            else:
+                values = rows[column]
+            for value in values.dropna().unique():
+                partitions[str(value)] = version
+
+        old_values = {str(value) for value in old[column].dropna().unique()}
+        new_values = {str(value) for value in new[column].dropna().unique()}
+        if old_values != new_values:
+            lineage["values"][column] = version
+
+    return {
+        "version": version,
+        "parent": parent["version"],
+        "source": source,
+        "rows": len(new),
+        "added": len(diff["added"]),
+        "removed": len(diff["removed"]),
+        "changed": len(diff["changed_new"]),
+        "changed_columns": diff["changed_columns"],
+        "lineage": lineage,
+    }
+
+
+def pending_vintages(drop_dir: Optional[str] = None) -> List[str]:
+    """
+    List the dataset vintages waiting in the drop directory, oldest first.
+
+    Args:
+        drop_dir (Optional[str]): Drop directory, defaults to config.drop_dir
+
+    Returns:
+        List[str]: Paths of the vintage files
+    """
+    drop_dir = drop_dir or config.drop_dir
+    if not os.path.isdir(drop_dir):
+        return []
+    paths = [
+        os.path.join(drop_dir, name)
+        for name in os.listdir(drop_dir)
+        if os.path.splitext(name)[1].lower() in vintage_readers
+    ]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def ingest_vintage(path: str, data_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Diff a dataset vintage against the current snapshot and publish it if it changed.
+
+    Args:
+        path (str): Path of the vintage file
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        Optional[str]: Published version, None if the vintage had no changes
+    """
+    reader = vintage_readers[os.path.splitext(path)[1].lower()]
+    new = storage.normalize_dtypes(reader(path))
+    # the parent is read and the new version published under the lock, a sync
+    # or another refresh can not publish in between
+    with storage.data_lock(data_dir):
+        return _publish_vintage(new, path, data_dir)
+
+
+def _publish_vintage(
+    new: pd.DataFrame, path: str, data_dir: Optional[str] = None
+) -> Optional[str]:
+    """Diff a normalized vintage against the current snapshot and publish it if it changed"""
+    version = storage.new_version()
+    parent_version = storage.current_version(data_dir)
+    if parent_version is None:
+        changelog = storage.initial_changelog(new, version, path)
+        return storage.publish_snapshot(new, changelog, data_dir)
+
+    old = storage.read_snapshot(version=parent_version, data_dir=data_dir)
+    diff = diff_snapshots(old, new, config.plant_key_column_names)
+    if not (len(diff["added"]) or len(diff["removed"]) or len(diff["changed_new"])):
+        logger.info("%s has no changes against version %s", path, parent_version)
+        return None
+
+    parent = storage.read_changelog(parent_version, data_dir)
+    changelog = build_changelog(diff, old, new, version, parent, path)
+    logger.info(
+        "%s: %d added, %d removed, %d changed plants",
+        path,
+        changelog["added"],
+        changelog["removed"],
+        changelog["changed"],
+    )
+    return storage.publish_snapshot(new, changelog, data_dir)
+
+
+def refresh(
+    drop_dir: Optional[str] = None, data_dir: Optional[str] = None
+) -> List[str]:
+    """
+    Ingest every vintage waiting in the drop directory, in order.
+
+    Ingested files are moved to the "processed" folder of the drop directory.
+
+    Args:
+        drop_dir (Optional[str]): Drop directory, defaults to config.drop_dir
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        List[str]: Published versions
+    """
+    drop_dir = drop_dir or config.drop_dir
+    processed_dir = os.path.join(drop_dir, "processed")
+    versions = []
+    for path in pending_vintages(drop_dir):
+        version = ingest_vintage(path, data_dir)
+        if version is not None:
+            versions.append(version)
+        os.makedirs(processed_dir, exist_ok=True)
+        shutil.move(path, os.path.join(processed_dir, os.path.basename(path)))
+    return versions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Ingest new dataset vintages from the drop directory."
+    )
+    parser.add_argument("--drop-dir", help="directory with the new vintages")
+    parser.add_argument("--data-dir", help="directory where the snapshots are stored")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for version in refresh(drop_dir=args.drop_dir, data_dir=args.data_dir):
+        print(version)
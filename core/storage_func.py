@@ -0,0 +1,696 @@
+# import libraries
+import argparse
+import functools
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import config
+from core.cache_func import content_token
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the dataset to a compact in-memory representation.
+
+    Low cardinality text columns become categoricals, coordinates become float32
+    and the remaining float columns are downcasted only if no value changes.
+
+    Args:
+        df (pd.DataFrame): DataFrame to normalize
+
+    Returns:
+        pd.DataFrame: Normalized DataFrame
+    """
+    memory_before = df.memory_usage(deep=True).sum()
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in config.categorical_column_names:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                columns[column] = values.astype("category")
+        elif column in config.float32_column_names:
+            if values.dtype != np.float32:
+                columns[column] = values.astype(np.float32)
+        elif values.dtype == np.float64:
+            narrow = values.astype(np.float32)
+            if np.array_equal(
+                narrow.to_numpy(np.float64), values.to_numpy(), equal_nan=True
+            ):
+                columns[column] = narrow
+    if columns:
+        df = df.assign(**columns)
+
+    memory_after = df.memory_usage(deep=True).sum()
+    logger.info(
+        "dataset memory: %.1f MB -> %.1f MB (%d rows, %d columns normalized)",
+        memory_before / 1e6,
+        memory_after / 1e6,
+        len(df),
+        len(columns),
+    )
+    return df
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError(
+        "The shared dataset is read-only, make a copy or use .assign() instead"
+    )
+
+
+class _ReadOnlyIndexer:
+    """Indexer (.loc, .iloc, .at, .iat) of a ReadOnlyDataFrame that only reads"""
+
+    def __init__(self, indexer):
+        self._indexer = indexer
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    def __call__(self, *args, **kwargs):
+        return _ReadOnlyIndexer(self._indexer(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._indexer, name)
+
+    __setitem__ = _read_only
+
+
+class ReadOnlyDataFrame(pd.DataFrame):
+    """
+    DataFrame shared between sessions that can not be modified in place.
+
+    Adding, replacing or deleting columns, setting values through the indexers,
+    replacing the index or the columns and every inplace=True method raise a
+    TypeError, and the underlying buffers are read-only. Every frame derived
+    from it (slices, copies, group-bys) is a regular DataFrame.
+
+    The version of the snapshot and its lineage (see partition_token) are kept
+    as attributes, so caches can be keyed on them instead of the content.
+    """
+
+    _metadata = ["version", "lineage"]
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    insert = _read_only
+    pop = _read_only
+    update = _read_only
+    # every inplace=True method (rename, drop, fillna, sort_values, ...) ends here
+    _update_inplace = _read_only
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # the index, the columns and the columns set as attributes (df.col = ...)
+        if name in ("index", "columns") or (
+            "_mgr" in self.__dict__ and name in self.columns
+        ):
+            _read_only()
+        super().__setattr__(name, value)
+
+    @property
+    def loc(self):
+        return _ReadOnlyIndexer(super().loc)
+
+    @property
+    def iloc(self):
+        return _ReadOnlyIndexer(super().iloc)
+
+    @property
+    def at(self):
+        return _ReadOnlyIndexer(super().at)
+
+    @property
+    def iat(self):
+        return _ReadOnlyIndexer(super().iat)
+
+
+def _no_inplace(method):
+    """Wrap a DataFrame method to raise a TypeError when called with inplace=True"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if kwargs.get("inplace"):
+            _read_only()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+# checked before they run, some (e.g. replace on categoricals) modify shared
+# state before they reach _update_inplace
+for _name in [
+    "bfill",
+    "clip",
+    "drop",
+    "drop_duplicates",
+    "dropna",
+    "eval",
+    "ffill",
+    "fillna",
+    "interpolate",
+    "mask",
+    "query",
+    "rename",
+    "rename_axis",
+    "replace",
+    "reset_index",
+    "set_index",
+    "sort_index",
+    "sort_values",
+    "where",
+]:
+    setattr(ReadOnlyDataFrame, _name, _no_inplace(getattr(pd.DataFrame, _name)))
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mark the buffers of the columns as read-only.
+
+    Text (object) columns are stored as categoricals, whose codes can be frozen,
+    pandas needs writable buffers to inspect object arrays.
+
+    Args:
+        df (pd.DataFrame): DataFrame (or GeoDataFrame) to freeze, only its text columns are copied
+
+    Returns:
+        pd.DataFrame: The DataFrame, as a ReadOnlyDataFrame if it was a plain one
+    """
+    text_columns = [c for c in df.columns if df[c].dtype == object]
+    if text_columns:
+        df = df.assign(**{c: df[c].astype("category") for c in text_columns})
+    if type(df) is pd.DataFrame:
+        df = ReadOnlyDataFrame(df)
+
+    # pandas keeps every column inside a block, extension arrays (categoricals,
+    # datetimes) keep their values in an inner numpy array
+    for block in df._mgr.blocks:
+        values = block.values
+        for array in (
+            values,
+            getattr(values, "_ndarray", None),
+            getattr(values, "_codes", None),
+        ):
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                array.flags.writeable = False
+    return df
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Get the memory held by a dataframe, including the coordinates of geometries.
+
+    Args:
+        df (pd.DataFrame): DataFrame or GeoDataFrame to measure
+
+    Returns:
+        int: Memory usage in bytes
+    """
+    geometry_name = getattr(df, "_geometry_column_name", None)
+    if geometry_name is None:
+        return int(df.memory_usage(deep=True).sum())
+
+    import shapely
+
+    # two float64 per coordinate, shapely objects do not report their size
+    coordinates = shapely.get_num_coordinates(df[geometry_name].values._data).sum()
+    return int(df.drop(columns=geometry_name).memory_usage(deep=True).sum()) + int(
+        coordinates * 16
+    )
+
+
+def new_version() -> str:
+    """Get a new dataset version name, versions sort in creation order"""
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def current_version(data_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Get the dataset version currently published to the app.
+
+    Args:
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        Optional[str]: Current version, None if nothing has been published yet
+    """
+    try:
+        with open(os.path.join(data_dir or config.data_dir, "CURRENT")) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(data_dir: Optional[str] = None) -> List[str]:
+    """
+    Get every dataset version stored in the data directory, oldest first.
+
+    Args:
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        List[str]: Sorted list of versions
+    """
+    snapshot_dir = os.path.join(data_dir or config.data_dir, "snapshots")
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(
+        name[: -len(".arrow")]
+        for name in os.listdir(snapshot_dir)
+        if name.endswith(".arrow")
+    )
+
+
+def snapshot_path(version: Optional[str] = None, data_dir: Optional[str] = None) -> str:
+    """
+    Get the path of the local columnar snapshot of a dataset version.
+
+    Args:
+        version (Optional[str]): Dataset version, defaults to the current one
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        str: Path to the arrow ipc snapshot file
+    """
+    version = version or current_version(data_dir)
+    if version is None:
+        raise FileNotFoundError("No dataset version has been published yet")
+    return os.path.join(data_dir or config.data_dir, "snapshots", f"{version}.arrow")
+
+
+def changelog_path(version: str, data_dir: Optional[str] = None) -> str:
+    """Get the path of the changelog written with a dataset version"""
+    return os.path.join(data_dir or config.data_dir, "changelog", f"{version}.json")
+
+
+def manifest_path(version: str, data_dir: Optional[str] = None) -> str:
+    """Get the path of the manifest written with a dataset version"""
+    return os.path.join(data_dir or config.data_dir, "manifests", f"{version}.json")
+
+
+def write_snapshot(df: pd.DataFrame, path: str) -> str:
+    """
+    Write a dataframe to an uncompressed arrow ipc file, so it can be memory-mapped.
+
+    The file is written next to the destination and then renamed, readers never
+    see a half written snapshot.
+
+    Args:
+        df (pd.DataFrame): DataFrame to store
+        path (str): Destination path of the snapshot
+
+    Returns:
+        str: Path to the written snapshot
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(
+        df.reset_index(drop=True), tmp_path, compression="uncompressed"
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_json(data: Dict[str, Any], path: str) -> str:
+    """Write a json file atomically, the same way as write_snapshot"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, indent=1, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_changelog(version: str, data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read the changelog written with a dataset version.
+
+    Args:
+        version (str): Dataset version
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        Dict[str, Any]: Changelog with the diff against the parent version and the lineage
+    """
+    with open(changelog_path(version, data_dir), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _date_range(dates: pd.Series) -> List[Optional[str]]:
+    """First and last date of a datetime column as iso strings, None if empty"""
+    dates = dates.dropna()
+    if dates.empty:
+        return [None, None]
+    return [dates.min().isoformat(), dates.max().isoformat()]
+
+
+def build_manifest(df: pd.DataFrame, version: str) -> Dict[str, Any]:
+    """
+    Summarize a dataset version for the views that do not need its rows.
+
+    The totals by status come from a single group-by, the distinct values of
+    the filter columns keep their order of appearance in the dataset.
+
+    Args:
+        df (pd.DataFrame): Normalized dataset
+        version (str): Dataset version
+
+    Returns:
+        Dict[str, Any]: Row count, totals and date range by status, distinct
+        values of the filter columns and date range of the dataset
+    """
+    grouped = df.groupby("status", observed=True, sort=False)
+    totals = grouped.agg(
+        plant_count=("electric_power_inst", "size"),
+        electric_power_inst=("electric_power_inst", "sum"),
+        electric_power_decl=("electric_power_decl", "sum"),
+    )
+    status = {
+        str(value): {
+            "plant_count": int(row.plant_count),
+            "electric_power_inst": float(row.electric_power_inst),
+            "electric_power_decl": float(row.electric_power_decl),
+            "date_range": _date_range(grouped.get_group(value)["DatEntradaOperacao"]),
+        }
+        for value, row in totals.iterrows()
+    }
+    return {
+        "version": version,
+        "row_count": len(df),
+        "status": status,
+        "date_range": _date_range(df["DatEntradaOperacao"]),
+        "distinct_values": {
+            column: df[column].unique().tolist()
+            for column in config.dynamic_filter_column_names
+        },
+    }
+
+
+def read_manifest(version: str, data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read the manifest of a dataset version, building it for older snapshots.
+
+    Args:
+        version (str): Dataset version
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        Dict[str, Any]: Manifest, see build_manifest
+    """
+    path = manifest_path(version, data_dir)
+    if not os.path.exists(path):
+        df = read_snapshot(version=version, data_dir=data_dir)
+        write_json(build_manifest(df, version), path)
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+@contextmanager
+def data_lock(data_dir: Optional[str] = None) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a data directory, across threads and processes.
+
+    The lock is taken on data_dir/.lock, it serializes the syncs and refreshes
+    that publish new versions. It is not reentrant.
+
+    Args:
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+    """
+    data_dir = data_dir or config.data_dir
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, ".lock"), "a+") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def publish_snapshot(
+    df: pd.DataFrame,
+    changelog: Dict[str, Any],
+    data_dir: Optional[str] = None,
+) -> str:
+    """
+    Store a new dataset version and make it the current one.
+
+    The snapshot, its changelog and its manifest are written first and the
+    CURRENT pointer is replaced last, so running sessions switch from one
+    complete version to the next in a single step. Callers that decide what to
+    publish from the current version hold data_lock around it.
+
+    Args:
+        df (pd.DataFrame): Normalized dataset of the new version
+        changelog (Dict[str, Any]): Changelog of the new version, must have a "version" key
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        str: Published version
+    """
+    version = changelog["version"]
+    data_dir = data_dir or config.data_dir
+    write_snapshot(df, snapshot_path(version, data_dir))
+    write_json(changelog, changelog_path(version, data_dir))
+    write_json(build_manifest(df, version), manifest_path(version, data_dir))
+
+    # unique temporary file, concurrent publishers never replace each other's
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir, prefix="CURRENT.", suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        file.write(version)
+    os.replace(tmp_path, os.path.join(data_dir, "CURRENT"))
+    logger.info("published dataset version %s (%d rows)", version, len(df))
+    return version
+
+
+def initial_changelog(
+    df: pd.DataFrame, version: str, source: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the changelog of a dataset version without parent, every row is new.
+
+    Args:
+        df (pd.DataFrame): Normalized dataset
+        version (str): Version of the dataset
+        source (Optional[str]): Where the dataset was read from
+
+    Returns:
+        Dict[str, Any]: Changelog with every partition set to this version
+    """
+    return {
+        "version": version,
+        "parent": None,
+        "source": source,
+        "rows": len(df),
+        "added": len(df),
+        "removed": 0,
+        "changed": 0,
+        "changed_columns": {},
+        "lineage": {
+            "partitions": {
+                column: {str(value): version for value in df[column].dropna().unique()}
+                for column in config.dynamic_filter_column_names
+            },
+            "values": {
+                column: version for column in config.dynamic_filter_column_names
+            },
+        },
+    }
+
+
+def _frame_version(df: pd.DataFrame) -> str:
+    """Get the version of a shared dataset, a digest of the content of other dataframes"""
+    version = getattr(df, "version", None)
+    if version is not None:
+        return version
+    return ":".join(content_token(df))
+
+
+def partition_token(df: pd.DataFrame, column: str, value: Any) -> str:
+    """
+    Get the version in which the rows with a value in a column last changed.
+
+    Derived results that only read those rows stay valid while the token is the
+    same, even if other rows changed in newer versions.
+
+    Args:
+        df (pd.DataFrame): Shared dataset, with the lineage of its version
+        column (str): Column of the partition, one of the dynamic filter columns
+        value (Any): Value of the partition
+
+    Returns:
+        str: Dataset version
+    """
+    lineage = getattr(df, "lineage", None) or {}
+    partitions = lineage.get("partitions", {}).get(column, {})
+    return partitions.get(str(value), _frame_version(df))
+
+
+def values_token(df: pd.DataFrame) -> Tuple[Tuple[str, str], ...]:
+    """
+    Get the versions in which the distinct values of the filter columns last changed.
+
+    Args:
+        df (pd.DataFrame): Shared dataset, with the lineage of its version
+
+    Returns:
+        Tuple[Tuple[str, str], ...]: Pairs of column and version
+    """
+    lineage = getattr(df, "lineage", None) or {}
+    if "values" not in lineage:
+        return (("", _frame_version(df)),)
+    return tuple(sorted(lineage["values"].items()))
+
+
+def selection_token(
+    df: pd.DataFrame, filters: Optional[Dict[str, List[Any]]] = None
+) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Get the versions in which the rows selected by a combination of filters last changed.
+
+    Rows outside the selected values of any active filter can not change a
+    result computed from the selection, so the partitions of one filter are
+    enough, the one whose partitions changed the longest ago. Without filters
+    every row counts and the token is the dataset version.
+
+    Args:
+        df (pd.DataFrame): Shared dataset, with the lineage of its version
+        filters (Optional[Dict[str, List[Any]]]): Selected values by column, empty lists select everything
+
+    Returns:
+        Tuple[str, Tuple[str, ...]]: Filter column and the partition tokens of its selected values
+    """
+    candidates = [
+        (
+            column,
+            tuple(
+                partition_token(df, column, value) for value in sorted(map(str, values))
+            ),
+        )
+        for column, values in sorted((filters or {}).items())
+        if values
+    ]
+    if not candidates:
+        return ("", (_frame_version(df),))
+    return min(candidates, key=lambda candidate: max(candidate[1]))
+
+
+def sync_snapshot(
+    source: Optional[str] = None, data_dir: Optional[str] = None, force: bool = False
+) -> str:
+    """
+    Materialize the dataset into the local snapshot if it is not there yet.
+
+    The remote source is only read on the first sync (or when force is True),
+    every later start reads the local file. New vintages are added with
+    refresh_func instead. The sync holds data_lock, sessions starting at the
+    same time wait for the first one and use the version it published.
+
+    Args:
+        source (Optional[str]): Pickle file path or url, defaults to config.csv_file_path
+        data_dir (Optional[str]): Directory of the snapshot, defaults to config.data_dir
+        force (bool): Download the source again even if a snapshot exists
+
+    Returns:
+        str: Current dataset version
+    """
+    version = current_version(data_dir)
+    if version is not None and not force:
+        return version
+
+    with data_lock(data_dir):
+        # another session or process may have synced while this one waited
+        version = current_version(data_dir)
+        if version is not None and not force:
+            return version
+
+        source = source or config.csv_file_path
+        if not source:
+            raise FileNotFoundError(
+                f"No snapshot found in {data_dir or config.data_dir} and no source configured to sync it"
+            )
+        df = normalize_dtypes(pd.read_pickle(source))
+        return publish_snapshot(
+            df, initial_changelog(df, new_version(), source), data_dir
+        )
+
+
+def read_snapshot(
+    columns: Optional[List[str]] = None,
+    version: Optional[str] = None,
+    data_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Read a snapshot memory-mapped, loading only the requested columns.
+
+    Args:
+        columns (Optional[List[str]]): Columns to load, all of them if None
+        version (Optional[str]): Dataset version, defaults to the current one
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        pd.DataFrame: DataFrame with the requested columns
+    """
+    table = feather.read_table(
+        snapshot_path(version, data_dir), columns=columns, memory_map=True
+    )
+    return table.to_pandas(split_blocks=True)
+
+
+def load_dataset(
+    version: Optional[str] = None, data_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Load the columns of the dataset used by the app from a snapshot.
+
+    Args:
+        version (Optional[str]): Dataset version, defaults to the current one
+        data_dir (Optional[str]): Directory of the snapshots, defaults to config.data_dir
+
+    Returns:
+        pd.DataFrame: DataFrame with the columns of config.data_column_names, normalized
+    """
+    return normalize_dtypes(
+        read_snapshot(
+            columns=config.data_column_names, version=version, data_dir=data_dir
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Materialize the dataset into the local columnar snapshot."
+    )
+    parser.add_argument("--source", help="pickle file path or url of the dataset")
+    parser.add_argument("--data-dir", help="directory where the snapshot is stored")
+    parser.add_argument(
+        "--force", action="store_true", help="replace an existing snapshot"
+    )
+    args = parser.parse_args()
+    print(sync_snapshot(source=args.source, data_dir=args.data_dir, force=args.force))
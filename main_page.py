@@ -1,16 +1,15 @@
-import pandas as pd
-import numpy as np
-import geopandas as gpd
-import plotly.express as px
 import streamlit as st
+from typing import Any, Dict, Mapping
 import visualization_func as vf
 import aux_func as aux
+import timing_func as timing
+import config  # import file paths and constants
 
 
 # function to ensure loading the data
 def ensure_data_loaded():
-    if not st.session_state.get("dfData_loaded", False):
-        aux.initialize_session_state_data()
+    # always called, it also switches the session to a newly published dataset
+    aux.initialize_session_state_data()
     return st.session_state.dfData
 
 
@@ -21,41 +20,36 @@ def ensure_geedata_loaded():
 
 
 # define function for kpi of electric power
-def render_kpi_electric_power() -> None:
+def render_kpi_electric_power(power_by_status: Mapping[str, float]) -> None:
     """Create KPI for Installed, Porjected and In construction electric power"""
 
-    # data for total operative, projected and construction electric power
+    # data for total operative, projected and construction electric power, read
+    # from the manifest of the dataset version without touching the plant rows
     c1, c2, c3 = st.columns(3)
     with c1:
-        operative_electric_power = (
-            st.session_state.dfData.loc[
-                st.session_state.dfData["status"] == "Operação", "electric_power_inst"
-            ].sum()
-        ) / 1000
+        operative_electric_power = power_by_status.get("Operação", 0) / 1000
         st.metric(
             f"Total Installed Electric Power", f"{operative_electric_power:,.0f} MW"
         )
 
     with c2:
-        proj_electric_power = (
-            st.session_state.dfData.loc[
-                st.session_state.dfData["status"] == "Construção não iniciada",
-                "electric_power_inst",
-            ].sum()
-        ) / 1000
+        proj_electric_power = power_by_status.get("Construção não iniciada", 0) / 1000
         st.metric(f"Total Projected Electric Power", f"{proj_electric_power:,.0f} MW")
 
     with c3:
-        constr_electric_power = (
-            st.session_state.dfData.loc[
-                st.session_state.dfData["status"] == "Construção", "electric_power_inst"
-            ].sum()
-        ) / 1000
+        constr_electric_power = power_by_status.get("Construção", 0) / 1000
         st.metric(
             f"Total in Construction Electric Power", f"{constr_electric_power:,.0f} MW"
         )
 
 
+# define function for the prerendered default view, shown to new sessions
+def render_prerendered(view: Dict[str, Any]) -> None:
+    """Show the prerendered map and KPIs of the default status and category"""
+    st.plotly_chart(view["figures"]["loc_map"], use_container_width=True)
+    render_kpi_electric_power(view["kpis"])
+
+
 def main() -> None:
     """Main function to run the streamlit app in Main Page"""
 
@@ -70,8 +64,23 @@ def main() -> None:
     # initialize data of original dataframe and geodataframe
     # aux.initialize_session_state_data()
     # aux.initialize_session_state_geodata()
-    ensure_data_loaded()
-    ensure_geedata_loaded()
+    timing.start_run("main_page")
+    # title of the page
+    st.header("Brazilian electric matrix - Home")
+
+    # new sessions see the prerendered default view while the data loads, the
+    # live content replaces it
+    content = st.empty()
+    view = aux.prerendered_view("main_page")
+    if view is not None:
+        with timing.span("prerendered"):
+            with content.container():
+                render_prerendered(view)
+
+    with timing.span("load_data"):
+        ensure_data_loaded()
+    with timing.span("load_geodata"):
+        ensure_geedata_loaded()
     aux.initialize_session_state_variables()
 
     # render sidebar with pages naviation
@@ -87,21 +96,26 @@ def main() -> None:
         par_category = st.selectbox(
             "Category", options=st.session_state.map_category, index=0
         )
-    # title of the page
-    st.header("Brazilian electric matrix - Home")
-
-    # map with location of power plants
-    fig = vf.loc_map_plot(
-        df=st.session_state.dfData,
-        geodf=st.session_state.dfGeoData,
-        status=par_selec_status,
-        category=par_category,
-        color_scale="Pastel",
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    # render display of kpi for electric power
-    render_kpi_electric_power()
+    with content.container():
+        # map with location of power plants
+        with timing.span("figure:loc_map"):
+            fig = vf.loc_map_plot(
+                df=st.session_state.dfData,
+                geodf=st.session_state.dfGeoData[
+                    config.map_geometry_levels["locations"]
+                ],
+                status=par_selec_status,
+                category=par_category,
+                color_scale="Pastel",
+            )
+        with timing.span("chart:loc_map"):
+            st.plotly_chart(fig, use_container_width=True)
+
+        # render display of kpi for electric power
+        with timing.span("kpi"):
+            render_kpi_electric_power(aux.status_totals()["electric_power_inst"])
+
+    timing.finish_run({"status": par_selec_status, "category": par_category})
 
 
 if __name__ == "__main__":
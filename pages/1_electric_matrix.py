@@ -1,12 +1,12 @@
 import pandas as pd
-import numpy as np
 
 # import plotly.express as px
 import streamlit as st
-import streamlit_dynamic_filters as stdf
 from typing import List, Dict, Any
 import visualization_func as vz  # visualization functions for graphs
 import aux_func as aux  # auxiliary functions for manage data
+from core import cube_func  # sorting and pagination of the grouped tables
+import timing_func as timing  # timing of the stages of every run
 import config  # import file paths and constants
 
 
@@ -120,8 +120,6 @@ def render_sidebar() -> None:
 # function for render the main content of the page
 def render_main_content() -> None:
     """Render the main content of the page"""
-    # title of the page
-    st.header("Brazilian electric matrix - Electric Matrix")
     # select filters to group and graph
     groupby_columns = st.multiselect(
         "Select columns to display in table:",
@@ -137,9 +135,10 @@ def render_main_content() -> None:
             index=0,
         )
 
-        df_grouped = aux.groupby_func_to_df(
-            st.session_state.df_filtered, st.session_state.groupby_columns
-        )
+        with timing.span("groupby"):
+            df_grouped = aux.groupby_cube_to_df(
+                st.session_state.groupby_columns, st.session_state.filters
+            )
 
         render_visualization(df_grouped, st.session_state.graph_column)
         render_table(df_grouped)
@@ -159,21 +158,82 @@ def render_visualization(df_grouped: pd.DataFrame, category: str) -> None:
 
         c1, c2 = st.columns([0.4, 0.6])
         with c1:
-            fig = vz.pie_plot_status_category(df_grouped, category, color_dict)
-            st.plotly_chart(fig, use_container_width=True)
+            with timing.span("figure:pie"):
+                fig = vz.pie_plot_status_category(df_grouped, category, color_dict)
+            with timing.span("chart:pie"):
+                st.plotly_chart(fig, use_container_width=True)
         with c2:
-            fig = vz.bar_plot_status_category(df_grouped, category, color_dict)
-            st.plotly_chart(fig, use_container_width=True)
+            with timing.span("figure:bar"):
+                fig = vz.bar_plot_status_category(df_grouped, category, color_dict)
+            with timing.span("chart:bar"):
+                st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("No data available for visualization.")
 
 
+def render_prerendered(view: Dict[str, Any]) -> None:
+    """Render the prerendered graphs of the default grouping without filters"""
+    c1, c2 = st.columns([0.4, 0.6])
+    with c1:
+        st.plotly_chart(view["figures"]["pie"], use_container_width=True)
+    with c2:
+        st.plotly_chart(view["figures"]["bar"], use_container_width=True)
+
+
 def render_table(df_grouped: pd.DataFrame) -> None:
-    """Render the table (dataframe) based on the grouped data"""
+    """
+    Render the grouped data as a paginated table sorted on the server.
+
+    Only the rows of the current page are sorted and sent to the browser (as
+    arrow through st.dataframe, which renders the visible rows only), so fine
+    groupings with thousands of rows do not block the page.
+    """
     if not df_grouped.empty:
 
         st.subheader("Table for total Electric Power")
-        st.table(df_grouped)
+        columns = list(df_grouped.columns)
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            sort_column = st.selectbox(
+                "Sort by", options=columns, index=columns.index("electric_power_inst")
+            )
+        with c2:
+            ascending = (
+                st.radio("Order", options=["Descending", "Ascending"], horizontal=True)
+                == "Ascending"
+            )
+        with c3:
+            top_n = st.number_input(
+                "Top N by power (0 for all rows)", min_value=0, value=0, step=10
+            )
+        with c4:
+            page_size = st.selectbox("Rows per page", options=config.table_page_sizes)
+
+        n_rows = min(top_n, len(df_grouped)) if top_n else len(df_grouped)
+        n_pages = max(1, -(-n_rows // page_size))
+        # the label holds the number of pages, so the page goes back to the
+        # first one when it changes
+        page = st.number_input(
+            f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1
+        )
+        page = min(page, n_pages) - 1
+
+        with timing.span("table"):
+            df_page, n_rows = cube_func.table_page(
+                df_grouped, sort_column, ascending, page, page_size, top_n
+            )
+            st.dataframe(
+                df_page,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "electric_power_inst": st.column_config.NumberColumn(
+                        "electric_power_inst", format="%.2f"
+                    )
+                },
+            )
+        start = page * page_size
+        st.caption(f"Rows {start + 1:,} to {start + len(df_page):,} of {n_rows:,}")
     else:
         st.warning("No data available for the table")
 
@@ -189,13 +249,28 @@ def main() -> None:
     )
 
     # initialize session state dataframe and variables
-    aux.initialize_session_state_data()
+    timing.start_run("electric_matrix")
+    # title of the page
+    st.header("Brazilian electric matrix - Electric Matrix")
+
+    # new sessions see the prerendered graphs while the data loads, the live
+    # content replaces them
+    content = st.empty()
+    view = aux.prerendered_view("electric_matrix")
+    if view is not None:
+        with timing.span("prerendered"):
+            with content.container():
+                render_prerendered(view)
+
+    with timing.span("load_data"):
+        aux.initialize_session_state_data()
     aux.initialize_session_state_variables()
 
     # create dynamic filters for sidebar
-    dynamic_filters = stdf.DynamicFilters(
+    dynamic_filters = aux.IndexedDynamicFilters(
         st.session_state.dfData,
         filters=config.dynamic_filter_column_names,
+        index=aux.get_shared_index(st.session_state.dfData_version),
         filters_name="filters",
     )
     dynamic_filters.check_state()
@@ -213,7 +288,8 @@ def main() -> None:
     # st.sidebar.divider()
 
     # display dynamic filters in sidebar
-    dynamic_filters.display_filters("sidebar")
+    with timing.span("filters"):
+        dynamic_filters.display_filters("sidebar")
 
     # create reset filter button
     with st.sidebar:
@@ -221,11 +297,21 @@ def main() -> None:
             reinitialize_session_state_filters()
             st.rerun()
 
-    # assign filtered df
-    st.session_state.df_filtered = dynamic_filters.filter_df()
-
     # render the main content of the page
-    render_main_content()
+    with content.container():
+        render_main_content()
+
+    timing.finish_run(
+        {
+            "filters": {
+                column: values
+                for column, values in st.session_state.filters.items()
+                if values
+            },
+            "groupby_columns": st.session_state.groupby_columns,
+            "graph_column": st.session_state.graph_column,
+        }
+    )
 
 
 if __name__ == "__main__":
@@ -1,11 +1,15 @@
-import pandas as pd
-import numpy as np
-
 # import geopandas as gpd
-import plotly.express as px
 import streamlit as st
 import visualization_func as vz
 import aux_func as aux
+import timing_func as timing
+
+
+def render_description(par_category: str) -> None:
+    """Describe the historical evolution graph"""
+    st.write(
+        f"Historical evolution of installed electric power clasified by {par_category}."
+    )
 
 
 def main() -> None:
@@ -18,7 +22,22 @@ def main() -> None:
         initial_sidebar_state="expanded",
     )
     # initialize session state data and variables
-    aux.initialize_session_state_data()
+    timing.start_run("hist_evol")
+    # title of the page
+    st.header("Brazilian electric matrix - Historical Evolution")
+
+    # new sessions see the prerendered graph while the data loads, the live
+    # content replaces it
+    content = st.empty()
+    view = aux.prerendered_view("hist_evol")
+    if view is not None:
+        with timing.span("prerendered"):
+            with content.container():
+                render_description(view["params"]["category"])
+                st.plotly_chart(view["figures"]["hist_line"], use_container_width=True)
+
+    with timing.span("load_data"):
+        aux.initialize_session_state_data()
     aux.initialize_session_state_variables()
 
     # render sidebar with navigation across pages
@@ -31,17 +50,19 @@ def main() -> None:
             "Category", options=st.session_state.map_category, index=0
         )
 
-    # title of the page
-    st.header("Brazilian electric matrix - Historical Evolution")
+    with content.container():
+        # description text
+        render_description(par_category)
 
-    # description text
-    st.write(
-        f"Historical evolution of installed electric power clasified by {par_category}."
-    )
+        # display of historicar evolution graph
+        with timing.span("figure:hist_line"):
+            fig = vz.hist_line_plot(
+                st.session_state.dfData, par_category, color_scale="Plotly"
+            )
+        with timing.span("chart:hist_line"):
+            st.plotly_chart(fig, use_container_width=True)
 
-    # display of historicar evolution graph
-    fig = vz.hist_line_plot(st.session_state.dfData, par_category, color_scale="Plotly")
-    st.plotly_chart(fig, use_container_width=True)
+    timing.finish_run({"category": par_category})
 
 
 if __name__ == "__main__":
@@ -1,35 +1,78 @@
-import pandas as pd
-import numpy as np
-import geopandas as gpd
-import plotly.express as px
 import streamlit as st
 import visualization_func as vz
 import aux_func as aux
+import timing_func as timing
+import config  # import file paths and constants
 
 
-def render_map_graphs(par_status, par_category) -> None:
+def render_map_graphs(par_status, par_category, par_zoom, par_markers) -> None:
     """Create Choropleth map and points map"""
     c1, c2 = st.columns([0.5, 0.5])
 
     with c1:
         # st.subheader(f"Choropleth map by {par_status}")
-        fig = vz.choropleth_mapbox_ele_pow(
-            st.session_state.dfData, st.session_state.dfGeoData, par_status, "cividis"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        with timing.span("figure:choropleth"):
+            fig = vz.choropleth_mapbox_ele_pow(
+                st.session_state.dfData,
+                st.session_state.dfGeoData[config.map_geometry_levels["choropleth"]],
+                par_status,
+                "cividis",
+            )
+        with timing.span("chart:choropleth"):
+            st.plotly_chart(fig, use_container_width=True)
 
     with c2:
         # st.subheader(f"Locations map by {par_status} and {par_category}")
-        fig = vz.loc_map_plot(
-            st.session_state.dfData,
-            st.session_state.dfGeoData,
-            par_status,
-            par_category,
-            "Plotly",
+        with timing.span("figure:loc_map"):
+            fig = vz.loc_map_plot(
+                st.session_state.dfData,
+                st.session_state.dfGeoData[config.map_geometry_levels["locations"]],
+                par_status,
+                par_category,
+                "Plotly",
+                zoom=par_zoom,
+                clustering=par_markers.lower(),
+            )
+        with timing.span("chart:loc_map"):
+            st.plotly_chart(fig, use_container_width=True)
+
+
+def render_hex_density_map(par_status, par_category, par_resolution) -> None:
+    """Create the map of power summed in hexagonal cells"""
+    with timing.span("figure:hex_density"):
+        fig = vz.hex_density_map(
+            st.session_state.dfData, par_status, par_category, par_resolution, "cividis"
         )
+    with timing.span("chart:hex_density"):
         st.plotly_chart(fig, use_container_width=True)
 
 
+def render_description(
+    par_status, par_category, par_mode="States and locations", par_resolution=None
+) -> None:
+    """Describe the maps of the page in the selected map mode"""
+    if par_mode == "Hex density":
+        st.write(
+            f"Brazilian map with electric power of {par_status} plants summed in "
+            f"hexagonal cells at {par_resolution} resolution "
+            f"({config.hex_resolutions[par_resolution]:g}° radius), broken down by {par_category}."
+        )
+        return
+    st.write(
+        f"Brazilian map with electric power distribution by {par_status} and location of electric generators by {par_category}."
+    )
+
+
+def render_prerendered(view) -> None:
+    """Render the prerendered maps of the default status and category"""
+    render_description(view["params"]["status"], view["params"]["category"])
+    c1, c2 = st.columns([0.5, 0.5])
+    with c1:
+        st.plotly_chart(view["figures"]["choropleth"], use_container_width=True)
+    with c2:
+        st.plotly_chart(view["figures"]["loc_map"], use_container_width=True)
+
+
 def main() -> None:
     """Main function to run the streamlit app in Page 3 Geographical Distribution"""
     # page configuration
@@ -41,8 +84,23 @@ def main() -> None:
     )
 
     # initialize data, geodata and variables
-    aux.initialize_session_state_data()
-    aux.initialize_session_state_geodata()
+    timing.start_run("geo_distr")
+    # title of the page
+    st.header("Brazilian electric matrix - Geo Spacial Distribution")
+
+    # new sessions see the prerendered maps while the data loads, the live
+    # content replaces them
+    content = st.empty()
+    view = aux.prerendered_view("geo_distr")
+    if view is not None:
+        with timing.span("prerendered"):
+            with content.container():
+                render_prerendered(view)
+
+    with timing.span("load_data"):
+        aux.initialize_session_state_data()
+    with timing.span("load_geodata"):
+        aux.initialize_session_state_geodata()
     aux.initialize_session_state_variables()
 
     # render sidebar navigation across pages
@@ -57,15 +115,49 @@ def main() -> None:
         par_category = st.selectbox(
             "Category", options=st.session_state.map_category, index=0
         )
+        # State totals and plant locations, or power density in hexagons
+        par_mode = st.radio("Map mode", options=["States and locations", "Hex density"])
+        par_resolution = None
+        if par_mode == "Hex density":
+            # Size of the hexagons
+            par_resolution = st.select_slider(
+                "Hex resolution", options=list(config.hex_resolutions), value="medium"
+            )
+        else:
+            # Initial zoom of the locations map, sets the size of the clusters
+            par_zoom = st.select_slider(
+                "Map zoom",
+                options=[2.5] + config.cluster_zoom_levels[1:] + [8],
+                value=2.5,
+            )
+            # Plants drawn as clusters or raw points
+            par_markers = st.radio(
+                "Plant markers", options=["Auto", "Clusters", "Points"], horizontal=True
+            )
 
-    # title of the page
-    st.header("Brazilian electric matrix - Geo Spacial Distribution")
-    st.write(
-        f"Brazilian map with electric power distribution by {par_status} and location of electric generators by {par_category}."
-    )
+    with content.container():
+        render_description(par_status, par_category, par_mode, par_resolution)
+
+        # render maps to plot
+        if par_mode == "Hex density":
+            render_hex_density_map(
+                par_status=par_status,
+                par_category=par_category,
+                par_resolution=par_resolution,
+            )
+            params = {"resolution": par_resolution}
+        else:
+            render_map_graphs(
+                par_category=par_category,
+                par_status=par_status,
+                par_zoom=par_zoom,
+                par_markers=par_markers,
+            )
+            params = {"zoom": par_zoom, "markers": par_markers}
 
-    # render maps to plot
-    render_map_graphs(par_category=par_category, par_status=par_status)
+    timing.finish_run(
+        {"status": par_status, "category": par_category, "mode": par_mode, **params}
+    )
 
 
 if __name__ == "__main__":
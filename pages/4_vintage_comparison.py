@@ -0,0 +1,160 @@
+from datetime import datetime
+from typing import Any, Dict
+
+import streamlit as st
+import visualization_func as vz
+import aux_func as aux
+import timing_func as timing
+import config  # import file paths and constants
+from core import storage_func as storage  # dataset versions
+
+
+def version_label(version: str) -> str:
+    """Show a dataset version as its publication time"""
+    try:
+        published = datetime.strptime(version, "%Y%m%dT%H%M%S%fZ")
+    except ValueError:
+        return version
+    return published.strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def render_kpi_comparison(comparison: Dict[str, Any], net_power: float) -> None:
+    """Create KPIs for added, removed and moved plants and the net power change"""
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Added plants", f"{len(comparison['added']):,}")
+    c2.metric("Removed plants", f"{len(comparison['removed']):,}")
+    c3.metric("Status changes", f"{len(comparison['transitioned']):,}")
+    c4.metric("Net Electric Power", f"{net_power / 1000:,.0f} MW")
+
+
+def render_transitions(comparison: Dict[str, Any]) -> None:
+    """Render the status transitions and the plants that moved"""
+    st.subheader("Status transitions")
+    if comparison["transitions"].empty:
+        st.info("No plant changed its status between these versions.")
+        return
+    st.dataframe(
+        comparison["transitions"],
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "electric_power_inst": st.column_config.NumberColumn(
+                "electric_power_inst", format="%.2f"
+            )
+        },
+    )
+    with st.expander("Plants that changed status"):
+        st.dataframe(
+            comparison["transitioned"], hide_index=True, use_container_width=True
+        )
+
+
+def render_net_capacity(
+    old_version: str, new_version: str, column: str, status: Any
+) -> None:
+    """Render the net change of installed power by a column"""
+    st.subheader(f"Net change of Electric Power by {column}")
+    with timing.span("net_capacity"):
+        net = aux.net_capacity_totals(old_version, new_version, column, status)
+    with timing.span("figure:net_capacity"):
+        fig = vz.net_capacity_bar(net, column)
+    with timing.span("chart:net_capacity"):
+        st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Table of the net change"):
+        st.dataframe(net, hide_index=True, use_container_width=True)
+
+
+def main() -> None:
+    """Main function to run the streamlit app in Page 4 Vintage Comparison"""
+    # page configuration
+    st.set_page_config(
+        page_title="Brazilian electric matrix analysis",
+        page_icon=":bar_chart:",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
+    timing.start_run("vintage_comparison")
+
+    # render sidebar navigation across pages
+    aux.render_sidebar()
+
+    # title of the page
+    st.header("Brazilian electric matrix - Vintage Comparison")
+
+    versions = storage.list_versions()
+    if len(versions) < 2:
+        st.info(
+            "Only one version of the dataset has been published, new vintages are "
+            "ingested with `python -m core.refresh_func`."
+        )
+        timing.finish_run()
+        return
+
+    # add version selection to sidebar, the previous and current versions by default
+    with st.sidebar:
+        old_version = st.selectbox(
+            "Base version",
+            options=versions,
+            index=len(versions) - 2,
+            format_func=version_label,
+        )
+        new_version = st.selectbox(
+            "Compared version",
+            options=versions,
+            index=len(versions) - 1,
+            format_func=version_label,
+        )
+    if old_version == new_version:
+        st.warning("Select two different versions to compare.")
+        timing.finish_run()
+        return
+
+    with timing.span("compare"):
+        comparison = aux.get_vintage_comparison(old_version, new_version)
+    if comparison is None:
+        timing.stop_run({"old_version": old_version, "new_version": new_version})
+
+    # add breakdown filters to sidebar
+    with st.sidebar:
+        statuses = sorted(
+            next(iter(comparison["net_capacity"].values()))["status"].unique()
+        )
+        par_status = st.selectbox("Status", options=["All"] + statuses, index=0)
+        par_column = st.radio("Breakdown", options=config.comparison_column_names)
+    status = None if par_status == "All" else par_status
+
+    st.write(
+        f"Changes of the power plants registry from {version_label(old_version)} "
+        f"to {version_label(new_version)}."
+    )
+    net = aux.net_capacity_totals(old_version, new_version, par_column, status)
+    render_kpi_comparison(comparison, net["net"].sum())
+
+    render_transitions(comparison)
+    render_net_capacity(old_version, new_version, par_column, status)
+
+    # plants only in one of the versions
+    st.subheader("Added and removed plants")
+    c1, c2 = st.tabs(
+        [
+            f"Added ({len(comparison['added']):,})",
+            f"Removed ({len(comparison['removed']):,})",
+        ]
+    )
+    with c1:
+        st.dataframe(comparison["added"], hide_index=True, use_container_width=True)
+    with c2:
+        st.dataframe(comparison["removed"], hide_index=True, use_container_width=True)
+
+    timing.finish_run(
+        {
+            "old_version": old_version,
+            "new_version": new_version,
+            "status": par_status,
+            "breakdown": par_column,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# import libraries
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, NoReturn, Optional, Tuple
+
+import streamlit as st
+
+import config
+from core.cache_func import cache_stats
+
+# span returned when timing is disabled, entering it does nothing
+_NO_SPAN = nullcontext()
+# serializes the appends of every session to the log
+_log_lock = threading.Lock()
+
+
+class RunTimer:
+    """
+    Timings of the stages of one run (rerun) of a page.
+
+    Attributes
+    ----------
+    page : str
+        Name of the page.
+    session_id : str
+        Id of the streamlit session.
+    spans : list
+        Name, start offset and duration in seconds of every span, in order.
+    open_spans : list
+        Name and start time of the spans that have not finished yet.
+    """
+
+    def __init__(self, page: str, session_id: str):
+        self.page = page
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.open_spans: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a span of the run"""
+        start = time.perf_counter()
+        self.open_spans.append((name, start))
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.open_spans.remove((name, start))
+            self.spans.append((name, start - self.started, end - start))
+
+    def record(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Get the timings of the run as a json serializable record, open spans last"""
+        now = time.perf_counter()
+        spans = self.spans + [
+            (name, start - self.started, now - start) for name, start in self.open_spans
+        ]
+        return {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "page": self.page,
+            "session_id": self.session_id,
+            "params": params or {},
+            "total_s": now - self.started,
+            "spans": [
+                {"name": name, "start_s": start, "duration_s": duration}
+                for name, start, duration in spans
+            ],
+            "caches": cache_stats(),
+        }
+
+
+def timing_enabled() -> bool:
+    """Timing is enabled for every session by config or for one with ?debug=timing"""
+    return config.timing_enabled or st.query_params.get("debug") == "timing"
+
+
+def start_run(page: str) -> None:
+    """
+    Start timing a run of a page, if timing is enabled.
+
+    Args:
+        page (str): Name of the page
+    """
+    if not timing_enabled():
+        st.session_state.run_timer = None
+        return
+
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    st.session_state.run_timer = RunTimer(page, ctx.session_id if ctx else "")
+
+
+def span(name: str):
+    """
+    Time a stage of the current run.
+
+    When timing is disabled this returns a shared no-op context manager, the
+    cost is a session state lookup.
+
+    Args:
+        name (str): Name of the stage, e.g. "load_data" or "figure:loc_map"
+
+    Returns:
+        ContextManager: Context manager that times the enclosed block
+    """
+    timer = st.session_state.get("run_timer")
+    if timer is None:
+        return _NO_SPAN
+    return timer.span(name)
+
+
+def append_log(
+    record: Dict[str, Any], path: Optional[str] = None, max_bytes: Optional[int] = None
+) -> None:
+    """
+    Append a run record to the json-lines timing log.
+
+    When the log would grow past max_bytes it is moved to <path>.1, replacing
+    the previous one, and a new log is started.
+
+    Args:
+        record (Dict[str, Any]): Run record, see RunTimer.record
+        path (Optional[str]): Path of the log, defaults to config.timing_log_path
+        max_bytes (Optional[int]): Size of the log before rotating it, defaults to config.timing_log_max_bytes
+    """
+    path = path or config.timing_log_path
+    max_bytes = config.timing_log_max_bytes if max_bytes is None else max_bytes
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _log_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if (
+            os.path.exists(path)
+            and os.path.getsize(path) + len(line.encode("utf-8")) + 1 > max_bytes
+        ):
+            os.replace(path, f"{path}.1")
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+def finish_run(params: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Finish timing the current run, logging it and showing it in the sidebar.
+
+    Args:
+        params (Optional[Dict[str, Any]]): Parameters of the run, e.g. the selected status and category
+    """
+    timer = st.session_state.get("run_timer")
+    if timer is None:
+        return
+    st.session_state.run_timer = None
+
+    record = timer.record(params)
+    # sessions that opted in with ?debug=timing only see their timings
+    if config.timing_enabled and config.timing_log_path:
+        append_log(record)
+
+    with st.sidebar.expander("Timings", expanded=True):
+        st.caption(f"{record['page']}: {record['total_s'] * 1000:,.1f} ms")
+        st.dataframe(
+            [
+                {"span": item["name"], "ms": round(item["duration_s"] * 1000, 1)}
+                for item in record["spans"]
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+    # process-wide counters, hits of a run show up as fast figure spans
+    with st.sidebar.expander("Caches", expanded=False):
+        st.dataframe(
+            [
+                {
+                    "cache": name,
+                    "entries": f"{stats['entries']}/{stats['maxsize']}",
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "hit rate": round(
+                        stats["hits"] / max(1, stats["hits"] + stats["misses"]), 2
+                    ),
+                }
+                for name, stats in record["caches"].items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def stop_run(params: Optional[Dict[str, Any]] = None) -> NoReturn:
+    """
+    Finish timing the current run and stop it, see st.stop.
+
+    Runs that stop early, e.g. when the data fails to load, are logged and
+    shown like complete ones.
+
+    Args:
+        params (Optional[Dict[str, Any]]): Parameters of the run, e.g. the error that stopped it
+    """
+    finish_run(params)
+    st.stop()
@@ -1,12 +1,17 @@
 # import libraries
-import numpy as np
+# the figures are built by core.figure_func, this module caches them and the
+# data they are built from for the pages, geopandas is only imported for typing
 import pandas as pd
-import geopandas as gpd
-import plotly.express as px
-import plotly.colors as pc
 import plotly.graph_objects as go
-from typing import Dict, List, Any
+from typing import TYPE_CHECKING, Dict, List, Any
 import streamlit as st
+import config
+from core import cluster_func, figure_func
+from core.cache_func import LRUCache, cache_figure, frame_token, geometry_token
+from core.storage_func import partition_token, values_token
+
+if TYPE_CHECKING:
+    import geopandas as gpd
 
 
 @st.cache_data
@@ -22,13 +27,7 @@ def generate_color_dict_plotly(categories: List[str], colormap: str) -> Dict[str
     Returns:
     Dict[str, str]: Dictionary mapping categories to colors
     """
-    try:
-        colors = getattr(px.colors.qualitative, colormap)
-    except AttributeError:
-        print(f"Palette '{colormap}' not found. Using default 'Plotly' palette.")
-        colors = px.colors.qualitative.Plotly
-
-    return {category: colors[i % len(colors)] for i, category in enumerate(categories)}
+    return figure_func.generate_color_dict_plotly(categories, colormap)
 
 
 @st.cache_data
@@ -45,13 +44,49 @@ def get_color_plotly(color_dict, categories):
     ]  # Default to black if category not found
 
 
+# quantized geometry payloads embedded when static serving is disabled
+_geometry_payloads = LRUCache(maxsize=8, name="geometry_payloads")
+
+
+def state_geometry(geodf: "gpd.GeoDataFrame") -> Any:
+    """
+    Get the state geometries to reference from a figure.
+
+    When streamlit serves static files the figures only carry the url of the
+    quantized payload written by geo_func, and the browser downloads it once for
+    every map. Otherwise the quantized GeoJSON is embedded in the figure.
+
+    Args:
+        geodf (gpd.GeoDataFrame): GeoDataFrame with the states of Brazil
+
+    Returns:
+        Any: Url of the payload or GeoJSON dict, features are keyed by state abbreviation
+    """
+    url = geodf.attrs.get("geometry_url")
+    if url and st.get_option("server.enableStaticServing"):
+        return url
+
+    from core import geo_func
+
+    return _geometry_payloads.get_or_create(
+        geometry_token(geodf), lambda: geo_func.quantize_geojson(geodf)
+    )
+
+
 # define function for display choropleth map
-# @st.cache_resource
+@cache_figure(
+    lambda df, geodf, status, colors_scale: (
+        partition_token(df, "status", status),
+        geometry_token(geodf),
+        status,
+        colors_scale,
+    )
+)
 def choropleth_mapbox_ele_pow(
-    df: pd.DataFrame, geodf: gpd.GeoDataFrame, status: str, colors_scale: str
+    df: pd.DataFrame, geodf: "gpd.GeoDataFrame", status: str, colors_scale: str
 ) -> go.Figure:
     """
-    Create a choropleth map of electric power by state.
+    Create a choropleth map of electric power by state, see figure_func.choropleth_mapbox_ele_pow.
 
     Args:
         df (pd.DataFrame): DataFrame containing power plant data
@@ -62,303 +97,226 @@ def choropleth_mapbox_ele_pow(
     Returns:
         go.Figure: Plotly figure object containing the choropleth map
     """
-    # # read procesed data
-    # csv_file_path = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\transformed_data.pkl"
-    # df_aux = pd.read_pickle(csv_file_path)
-
-    # # read geojson data
-    # geojson_file_path_state = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\all_states.geojson"
-    # geojson_data_state = gpd.read_file(geojson_file_path_state)
-
-    # make dataframe for map
-    df_sorted = (
-        df[df["status"] == status]
-        .groupby("states")
-        .agg({"electric_power_inst": "sum", "electric_power_decl": "sum"})
-        .reset_index()
+    return figure_func.choropleth_mapbox_ele_pow(
+        df, state_geometry(geodf), status, colors_scale
     )
 
-    # get better color for limits of the range in the color map
-    key_min = np.percentile(df_sorted.electric_power_inst, 5)
-    key_max = np.percentile(df_sorted.electric_power_inst, 95)
-
-    # get the center of brazil to display by default
-    # state_bounds = geojson_data_state.geometry.total_bounds
-    # south, west, north, east = state_bounds
-
-    # Calculate the center coordinates
-    # center = {"lat": (south + north) / 2, "lon": (west + east) / 2}
-    center = {"lat": -11.61, "lon": -51.81}
-    # Calculate the zoom level
-    zoom = 2.3  # Start with a zoom level of 4 (can be adjusted as needed)
-
-    # create choropleth map
-    fig = px.choropleth_mapbox(
-        df_sorted,
-        geojson=geodf,
-        locations="states",
-        featureidkey="properties.abbrev_state",
-        color="electric_power_inst",
-        color_continuous_scale=colors_scale,
-        mapbox_style="carto-darkmatter",
-        range_color=[key_min, key_max],
-        center=center,
-        zoom=zoom,
-        opacity=1,
-        labels={"electric_power_inst": "Electric Power KW"},
-        # title=f"Electric Power by State by {status}",
+
+# define bar and pie plots by status and category, grouped frames are keyed
+# by their lineage token
+bar_plot_status_category = cache_figure(
+    lambda df, category, color_dict: (
+        frame_token(df),
+        category,
+        tuple(color_dict.items()),
     )
-    fig.update_geos(fitbounds="locations", visible=False, scope="south america")
-
-    # update layout atributes
-    fig.update_layout(
-        mapbox=dict(style="carto-darkmatter"),
-        # paper_bgcolor="#343a40",
-        # plot_bgcolor="#343a40",
-        # font_color="white",
-        legend=dict(title=dict(text="Legend Title"), orientation="h", x=1, y=1.02),
+)(figure_func.bar_plot_status_category)
+pie_plot_status_category = cache_figure(
+    lambda df, category, color_dict: (
+        frame_token(df),
+        category,
+        tuple(color_dict.items()),
     )
+)(figure_func.pie_plot_status_category)
 
-    return fig
 
+# define net capacity plot of two dataset versions, the totals are tagged with
+# their versions, column and status
+net_capacity_bar = cache_figure(lambda net, column: (frame_token(net), column))(
+    figure_func.net_capacity_bar
+)
 
-# define bar plot by status and category
-@st.cache_data
-def bar_plot_status_category(
-    df: pd.DataFrame, category: str, color_dict: Dict[str, str]
-) -> go.Figure:
+
+# #define historical line plot
+# the shared dataset is immutable, so it is hashed by the versions in which the
+# operative plants and the distinct category values last changed
+@st.cache_resource(max_entries=8)
+# accumulate the installed power of the operative plants by year and category
+def historic_power(_df: pd.DataFrame, token: Any, category: str) -> Any:
     """
-    Create a bar plot of electric power by category.
+    Get the installed power of the operative plants accumulated by year and category.
+
+    The dataframe is not hashed, the result is cached by the lineage tokens of
+    the operative plants and of the category values.
 
     Args:
-        df (pd.DataFrame): DataFrame containing grouped data
-        category (str): Category to plot
-        color_dict (Dict[str, str]): Dictionary mapping categories to colors
+        _df (pd.DataFrame): DataFrame with the power plants
+        token (Any): Lineage tokens of the data read, see hist_line_plot
+        category (str): Column to break the power down by
 
     Returns:
-        go.Figure: Plotly figure object containing the bar plot
+        Any: Categories, years and cumulative power matrix, see figure_func.historic_power
     """
+    return figure_func.historic_power(_df, category)
 
-    df_aux = df.copy()
-    # make sorted dataframe
-    df_sorted = (
-        df_aux.groupby(category).agg({"electric_power_inst": "sum"}).reset_index()
-    )
 
-    # make bar graph
-    fig = px.bar(
-        df_sorted,
-        x=category,
-        y=df_sorted["electric_power_inst"] / 1000,
-        color=category,
-        color_discrete_map=color_dict,
-        # title=f"Electric power by {status} and by {category}",
-        labels={category: category, "y": "Electric Power (MW)"},
-    )
-    fig.update_layout(
-        legend_title=None,
-        showlegend=True,
-        xaxis_title=None,
+# define historical evolution plot of the installed power
+@cache_figure(
+    lambda df, category, color_scale: (
+        partition_token(df, "status", "Operação"),
+        values_token(df),
+        category,
+        color_scale,
     )
-    fig.update_xaxes(tickangle=45)
+)
+def hist_line_plot(df, category, color_scale):
+    """
+    Create a stacked area chart of the installed power of operative plants over time.
 
-    return fig
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        category (str): Column to break the power down by
+        color_scale (str): Name of the Plotly qualitative color palette to use
 
+    Returns:
+        go.Figure: Plotly figure
+    """
+    # for this graph, only take into consideration operative power plants
+    token = (partition_token(df, "status", "Operação"), values_token(df))
+    return figure_func.hist_line_plot(
+        historic_power(df, token, category), category, color_scale
+    )
 
-# #define pie plot by status and category
-@st.cache_data
-def pie_plot_status_category(
-    df: pd.DataFrame, category: str, color_dict: Dict[str, str]
-) -> go.Figure:
+
+@st.cache_resource(max_entries=32)
+# precompute the clusters of the plants of a status at every zoom level
+def status_cluster_levels(
+    _df: pd.DataFrame, token: str, status: str, category: str
+) -> Dict[int, Any]:
     """
-    Create a pie plot of electric power by category.
+    Precompute the grid clusters of the plants with a status at every zoom level.
+
+    The dataframe is not hashed, the clusters are cached by the lineage token of
+    the status partition of the dataset.
 
     Args:
-        df (pd.DataFrame): DataFrame containing grouped data
-        category (str): Category to plot
-        color_dict (Dict[str, str]): Dictionary mapping categories to colors
+        _df (pd.DataFrame): DataFrame with the power plants
+        token (str): Partition token of the status, see storage_func.partition_token
+        status (str): Status of the plants to cluster
+        category (str): Column used for the breakdown of the power of each cluster
 
     Returns:
-        go.Figure: Plotly figure object containing the bar plot
+        Dict[int, Any]: Clusters and breakdown by zoom level, see cluster_func.cluster_levels
     """
+    return cluster_func.cluster_levels(_df[_df["status"] == status], category)
 
-    df_aux = df.copy()
 
-    # make sorted dataframe
-    df_sorted = (
-        df_aux.groupby(category).agg({"electric_power_inst": "sum"}).reset_index()
-    )
-
-    # plot the pie graph
-    fig = px.pie(
-        df_sorted,
-        values="electric_power_inst",
-        names=category,
-        # title=f"Electric Power by {status} and by {category}",
-        color=category,
-        color_discrete_map=color_dict,
-        labels={category: category, "electric_power_inst": "Electric Power (KW)"},
+# define location map for every generator
+@cache_figure(
+    lambda df, geodf, status, category, color_scale, zoom, clustering: (
+        partition_token(df, "status", status),
+        values_token(df),
+        geometry_token(geodf),
+        status,
+        category,
+        color_scale,
+        zoom,
+        clustering,
     )
+)
+def loc_map_plot(df, geodf, status, category, color_scale, zoom=2.5, clustering="auto"):
+    """
+    Create the map with the location of the power plants of a status.
 
-    fig.update_layout(showlegend=False)
-
-    return fig
+    The clusters of the status are shared by the maps of every zoom level, see
+    figure_func.loc_map_plot.
 
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        geodf (gpd.GeoDataFrame): GeoDataFrame with the states of Brazil
+        status (str): Status of the plants to display
+        category (str): Column used to color the plants
+        color_scale (str): Name of the Plotly qualitative color palette to use
+        zoom (float): Initial zoom level of the map
+        clustering (str): "auto", "clusters" or "points"
 
-# #define historical line plot
-@st.cache_data
-def hist_line_plot(df, category, color_scale):
+    Returns:
+        go.Figure: Plotly figure
+    """
+    levels = None
+    n_points = int((df["status"] == status).sum())
+    if figure_func.use_clusters(n_points, zoom, clustering):
+        levels = status_cluster_levels(
+            df, partition_token(df, "status", status), status, category
+        )
+    return figure_func.loc_map_plot(
+        df,
+        geodf,
+        state_geometry(geodf),
+        status,
+        category,
+        color_scale,
+        zoom=zoom,
+        clustering=clustering,
+        levels=levels,
+    )
 
-    # read data
-    # csv_file_path = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\transformed_data.pkl"
-    # df_aux = pd.read_pickle(csv_file_path)
-    df_aux = df
-    # generate colors for graph
-    categories = df_aux[category].unique()
-    color_dict = generate_color_dict_plotly(categories=categories, colormap=color_scale)
 
-    # for this graph, only take into consideration operative power plants
-    df_sorted = df_aux[df_aux["status"] == "Operação"]
-    # get the year of the datetime column to do a groupby
+@st.cache_resource(max_entries=8)
+# assign the plants to the cells of a hexagonal grid
+def hex_grid_cells(_df: pd.DataFrame, token: str, resolution: str) -> Any:
+    """
+    Assign the plants to the cells of the hexagonal grid of a resolution.
 
-    df_sorted["Year"] = df_sorted["DatEntradaOperacao"].dt.year
+    Args:
+        _df (pd.DataFrame): DataFrame with the power plants, not hashed
+        token (str): Dataset version, the grid is cached by it
+        resolution (str): Resolution of the grid, one of config.hex_resolutions
 
-    # group by year and category and summ the electric power
-    df_sorted = (
-        df_sorted.groupby(["Year", category])["electric_power_inst"].sum().reset_index()
-    )
-    df_sorted = df_sorted.sort_values("Year")
-    # calculate cumulative sum of the power by category
-    df_sorted["Cumulative_Power"] = df_sorted.groupby(category)[
-        "electric_power_inst"
-    ].cumsum()
-
-    # create a dataframe with all the years from min to max date with every category combination
-    year_range = range(df_sorted["Year"].min(), df_sorted["Year"].max() + 1)
-    df_all_years = pd.DataFrame(
-        [(year, cat) for year in year_range for cat in categories],
-        columns=["Year", category],
-    )
+    Returns:
+        Any: Cell code of every row and cells, see cluster_func.hex_grid
+    """
+    return cluster_func.hex_grid(_df, config.hex_resolutions[resolution])
 
-    # merge dataframe with cumulative electric power with dataframe with all years
-    df_historic = pd.merge(
-        df_all_years,
-        df_sorted[["Year", category, "Cumulative_Power"]],
-        on=["Year", category],
-        how="left",
-    )
 
-    # fill forward cumulative values to fill NaN or 0 gaps
-    df_historic["Cumulative_Power"] = df_historic.groupby(category)[
-        "Cumulative_Power"
-    ].ffill()
-
-    # fill any remaining NaN value with 0, specially the first values not filled before
-    df_historic["Cumulative_Power"] = df_historic["Cumulative_Power"].fillna(0)
-
-    # Create the stacked area chart
-    fig = px.area(
-        df_historic,
-        x="Year",
-        y="Cumulative_Power",
-        color=category,
-        color_discrete_map=color_dict,
-        labels={
-            "Cumulative_Power": "Installed Power (kW)",
-            category: category,
-        },
-        # title=f"Historical Evolution of Installed Electric Power by {category}",
-    )
+@st.cache_resource(max_entries=32)
+# sum the power of the plants of a status in every hexagon
+def hex_density_cells(
+    _df: pd.DataFrame, token: str, resolution: str, status: str, category: str
+) -> Any:
+    """
+    Sum the power of the plants of a status in every cell of a hexagonal grid.
 
-    # Customize the layout
-    fig.update_layout(
-        # xaxis_title="Year",
-        yaxis_title="Total Installed Power (kW)",
-        legend_title=category,
-        hovermode="x unified",
-        # paper_bgcolor="#343a40",
-        # plot_bgcolor="#343a40",
-        # font_color="white",
-    )
+    Args:
+        _df (pd.DataFrame): DataFrame with the power plants, not hashed
+        token (str): Dataset version, the cells are cached by it
+        resolution (str): Resolution of the grid, one of config.hex_resolutions
+        status (str): Status of the plants
+        category (str): Column used for the breakdown of the power of each cell
 
-    return fig
+    Returns:
+        Any: Non-empty cells and their breakdown, see cluster_func.hex_density_cells
+    """
+    codes, cells = hex_grid_cells(_df, token, resolution)
+    return cluster_func.hex_density_cells(_df, codes, cells, status, category)
 
 
-# define location map for every generator
-# @st.cache_resource
-def loc_map_plot(df, geodf, status, category, color_scale):
-
-    # # read data
-    # csv_file_path = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\transformed_data.pkl"
-    # df_aux = pd.read_pickle(csv_file_path)
-
-    # # read geojson data
-    # geojson_file_path_state = r"C:\Users\Mariano\Documents\aprendizaje-data-science\repositorio-brazilian-electric-matrix\Brazilian-electric-matrix\data\processed\all_states.geojson"
-    # geojson_data_state = gpd.read_file(geojson_file_path_state)
-    df_aux = df
-    geojson_data_state = geodf
-
-    # define colors for graph
-    categories = df_aux[category].unique()
-    color_dict = generate_color_dict_plotly(categories=categories, colormap=color_scale)
-
-    # filter dataframe
-    df_filtered = df_aux[df_aux["status"] == status]
-
-    # create colormap for points of location by category
-    color_discrete_map = {
-        cat: color
-        for cat, color in color_dict.items()
-        if cat in df_filtered[category].unique()
-    }
-
-    # Calculate the center coordinates
-    center = {"lat": -11.61, "lon": -51.81}
-
-    # Calculate the zoom level
-    zoom = 2.5  # Start with a zoom level of 4 (can be adjusted as needed)
-
-    # Create the base map
-    fig = px.choropleth_mapbox(
-        geojson_data_state,
-        geojson=geojson_data_state.geometry,
-        locations=geojson_data_state.index,
-        mapbox_style="carto-darkmatter",
-        zoom=zoom,
-        center=center,
-        opacity=0.2,
+@cache_figure(
+    lambda df, status, category, resolution, colors_scale: (
+        frame_token(df),
+        status,
+        category,
+        resolution,
+        colors_scale,
     )
-    # delete the legend of the choropleth
-    fig.data[0].showlegend = False
-
-    # Add scatter plot for location points of power plants
-    for cat in categories:
-        category_data = df_filtered[df_filtered[category] == cat]
-        fig.add_trace(
-            go.Scattermapbox(
-                lat=category_data["latitude"],
-                lon=category_data["longitude"],
-                mode="markers",
-                marker=dict(size=5, color=color_dict[cat]),
-                text=category_data.apply(
-                    lambda row: f"Name: {row['NomEmpreendimento']}<br>"
-                    f"Elec. Power: {row['electric_power_inst']:.2f} kW<br>"
-                    f"Lat: {row['latitude']:.4f}<br>"
-                    f"Lon: {row['longitude']:.4f}",
-                    axis=1,
-                ),
-                name=cat,  # This will appear in the legend
-                hoverinfo="text",
-            )
-        )
+)
+def hex_density_map(
+    df: pd.DataFrame, status: str, category: str, resolution: str, colors_scale: str
+) -> go.Figure:
+    """
+    Create a map of the installed power summed in the cells of a hexagonal grid.
 
-    # Update layout
-    # fig.update_layout(
-    #     title="Power Plants in Brazil",
-    #     legend_title="Power Plants",
-    #     # paper_bgcolor="#343a40",
-    #     # plot_bgcolor="#343a40",
-    #     # font_color="white",
-    # )
+    Args:
+        df (pd.DataFrame): DataFrame with the power plants
+        status (str): Status of the plants to display
+        category (str): Column used for the breakdown of the power of each cell
+        resolution (str): Resolution of the grid, one of config.hex_resolutions
+        colors_scale (str): Color scale for the map
 
-    return fig
+    Returns:
+        go.Figure: Plotly figure
+    """
+    cells, breakdown = hex_density_cells(
+        df, frame_token(df), resolution, status, category
+    )
+    return figure_func.hex_density_map(cells, breakdown, resolution, colors_scale)